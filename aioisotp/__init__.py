@@ -2,4 +2,5 @@ from .version import __version__
 from .network import ISOTPNetwork
 from .sync import SyncISOTPNetwork
 from .transports.userspace import ISOTPTransport
-from .exceptions import ISOTPError
+from .exceptions import (ISOTPError, ISOTPTimeoutError, ISOTPOverflowError,
+                         ISOTPWaitOverrunError, NegativeResponseError)
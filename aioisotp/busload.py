@@ -0,0 +1,139 @@
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Approximate length of an error frame including the following
+# inter-frame space
+ERROR_FRAME_BITS = 31
+
+
+def frame_bits(msg):
+    """Nominal number of bits for a CAN frame on the bus, excluding
+    stuff bits but including the inter-frame space.
+    """
+    if msg.is_error_frame:
+        return ERROR_FRAME_BITS
+    overhead = 67 if msg.is_extended_id else 47
+    return overhead + 8 * len(msg.data)
+
+
+class BusLoad:
+    """Estimates CAN bus load from sent and received frames and throttles
+    senders when the bus is busy.
+
+    Frames are counted in windows of *window* seconds. When a window is
+    complete, :attr:`load`, :attr:`error_rate` and :attr:`frame_rate` are
+    updated from it. If the load or the error rate is above its threshold,
+    :attr:`tx_delay` is doubled. It is halved after *release_after* windows
+    in a row with both below *release* times their thresholds, and kept
+    as is in between, so that senders are not let loose again as soon as
+    the bus calms down. Transports add it as extra separation time
+    between consecutive frames and before starting the next PDU.
+
+    Every :class:`~aioisotp.ISOTPNetwork` has an instance as its
+    :attr:`~aioisotp.ISOTPNetwork.bus_load` attribute, which by default
+    only estimates. Give one as *bus_load* to the network to enable
+    throttling.
+
+    :param int bitrate:
+        Bit rate of the bus in bits per second.
+    :param float window:
+        Length of each measurement window in seconds.
+    :param float max_load:
+        Throttle senders when the share of bus time used is above this,
+        between 0 and 1. `None` disables.
+    :param float max_error_rate:
+        Throttle senders when the share of error frames is above this,
+        between 0 and 1. `None` disables.
+    :param float min_delay:
+        Extra separation time when starting to throttle, in seconds.
+    :param float max_delay:
+        Max extra separation time in seconds.
+    :param float release:
+        Share of the thresholds, between 0 and 1, below which a window
+        counts as quiet.
+    :param int release_after:
+        Number of quiet windows in a row before easing the throttling.
+    """
+
+    def __init__(self, bitrate=500000, window=0.1, max_load=None,
+                 max_error_rate=None, min_delay=0.001, max_delay=0.1,
+                 release=0.8, release_after=4):
+        self.bitrate = bitrate
+        self.window = window
+        self.max_load = max_load
+        self.max_error_rate = max_error_rate
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.release = release
+        self.release_after = release_after
+        #: Share of bus time used during the last window
+        self.load = 0.0
+        #: Share of frames that were error frames during the last window
+        self.error_rate = 0.0
+        #: Frames per second during the last window
+        self.frame_rate = 0.0
+        #: Extra delay in seconds senders should wait between frames
+        self.tx_delay = 0.0
+        self._window_start = None
+        self._frames = 0
+        self._bits = 0
+        self._errors = 0
+        self._quiet_windows = 0
+
+    def add(self, msg, now):
+        """Count a frame seen on the bus.
+
+        :param can.Message msg:
+            A sent or received frame, or an error frame.
+        :param float now:
+            Current time in seconds.
+        """
+        if self._window_start is None:
+            self._window_start = now
+        elif now - self._window_start >= self.window:
+            self._end_window(now)
+        self._frames += 1
+        self._bits += frame_bits(msg)
+        if msg.is_error_frame:
+            self._errors += 1
+
+    def _end_window(self, now):
+        windows = int((now - self._window_start) / self.window)
+        self._window_start += windows * self.window
+        self.load = self._bits / (self.bitrate * self.window)
+        self.frame_rate = self._frames / self.window
+        self.error_rate = self._errors / self._frames if self._frames else 0.0
+        self._frames = self._bits = self._errors = 0
+
+        if self._above(1.0):
+            self._quiet_windows = 0
+            delay = min(max(self.tx_delay * 2, self.min_delay), self.max_delay)
+            if delay != self.tx_delay:
+                LOGGER.info('Bus load %.0f %%, error rate %.1f %%, '
+                            'throttling senders by %g ms',
+                            self.load * 100, self.error_rate * 100,
+                            delay * 1000)
+            self.tx_delay = delay
+        elif self.tx_delay:
+            if windows == 1 and self._above(self.release):
+                # Close to the limit, the current delay is about right
+                self._quiet_windows = 0
+            else:
+                # Windows without any frames also count as quiet
+                self._quiet_windows += windows
+            steps = self._quiet_windows // self.release_after
+            if steps:
+                self._quiet_windows %= self.release_after
+                delay = self.tx_delay / 2 ** steps
+                self.tx_delay = delay if delay >= self.min_delay else 0.0
+        if windows > 1:
+            # Nothing was seen in the windows that followed
+            self.load = self.frame_rate = self.error_rate = 0.0
+
+    def _above(self, share):
+        return ((self.max_load is not None and
+                 self.load > self.max_load * share) or
+                (self.max_error_rate is not None and
+                 self.error_rate > self.max_error_rate * share))
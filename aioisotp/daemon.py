@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import logging
+import os
+import stat
+
+from .network import ISOTPNetwork
+from .transports.daemon import (FramedProtocol, IDS,
+                                OPEN, OPENED, DATA, CLOSE, CLOSED)
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ISOTPDaemon:
+    """Shares one :class:`~aioisotp.ISOTPNetwork` with other processes.
+
+    Clients connect over a Unix socket, either by using the 'daemon'
+    interface of :class:`~aioisotp.ISOTPNetwork` with the socket path as
+    channel, or by running::
+
+        $ python -m aioisotp.daemon -i socketcan -c can0 -s /tmp/aioisotp.sock
+
+    Each client may open any number of connections, as long as receive IDs
+    are not used by more than one connection at a time.
+
+    A client which does not keep up with received PDUs is first asked to
+    slow down by pausing reception on its ISO-TP connections, and is
+    disconnected if more than *max_buffer* bytes are still waiting to be
+    sent to it. A client sending PDUs faster than they can be sent on the
+    bus stops being read from while more than *high_water* bytes are
+    queued on one of its connections. Clients sending PDUs larger than
+    *max_pdu_size* are disconnected.
+
+    :param aioisotp.ISOTPNetwork network:
+        An opened network to share.
+    :param str path:
+        Path of the Unix socket to listen on.
+    :param int max_buffer:
+        Max number of bytes to buffer for each client.
+    :param int high_water:
+        Max number of bytes to queue for sending on each connection
+        before waiting.
+    :param int max_pdu_size:
+        Max size of PDUs sent by clients. The default is the largest PDU
+        without the 32 bit length escape of ISO 15765-2:2016.
+    """
+
+    def __init__(self, network, path, max_buffer=1024 * 1024,
+                 high_water=64 * 1024, max_pdu_size=4095):
+        self.network = network
+        self.path = path
+        self.max_buffer = max_buffer
+        self.high_water = high_water
+        self.max_pdu_size = max_pdu_size
+        self._loop = network._loop
+        self._server = None
+        #: Receive IDs currently in use by clients
+        self.rxids = set()
+
+    async def start(self):
+        """Start listening for clients.
+
+        This method is a *coroutine*.
+        """
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            # Left behind by a previous daemon
+            os.unlink(self.path)
+        self._server = await self._loop.create_unix_server(
+            lambda: _ClientHandler(self), self.path)
+        LOGGER.info('Listening on %s', self.path)
+
+    def close(self):
+        """Stop listening for new clients."""
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            os.unlink(self.path)
+
+
+class _ClientHandler(FramedProtocol):
+    """Serves one client process."""
+
+    def __init__(self, daemon):
+        super().__init__(daemon.max_pdu_size)
+        self.daemon = daemon
+        # Channel number -> (transport, rxid)
+        self.channels = {}
+        # Channel numbers being opened
+        self._opening = set()
+        # Client is not reading fast enough
+        self.writing_paused = False
+        # Number of connections with too much queued for sending
+        self._throttled = 0
+
+    def message_received(self, msg_type, channel, payload):
+        if msg_type == DATA:
+            if channel in self.channels:
+                transport = self.channels[channel][0]
+                transport.write(payload)
+                if transport.get_write_buffer_size() > self.daemon.high_water:
+                    transport.get_protocol().throttle()
+        elif msg_type == OPEN:
+            if len(payload) != IDS.size:
+                self.send_message(CLOSED, channel, b'Malformed OPEN message')
+                return
+            if channel in self.channels or channel in self._opening:
+                self.send_message(CLOSED, channel,
+                                  b'Channel %d already open' % channel)
+                return
+            rxid, txid = IDS.unpack(payload)
+            if rxid in self.daemon.rxids:
+                self.send_message(CLOSED, channel,
+                                  b'Receive ID 0x%X already in use' % rxid)
+                return
+            self.daemon.rxids.add(rxid)
+            self._opening.add(channel)
+            self.daemon._loop.create_task(self._open(channel, rxid, txid))
+        elif msg_type == CLOSE:
+            if channel in self.channels:
+                self._close_channel(channel)
+        else:
+            LOGGER.error('Unknown message type %d from client', msg_type)
+
+    async def _open(self, channel, rxid, txid):
+        try:
+            transport, _ = await self.daemon.network.create_connection(
+                lambda: _Forwarder(self, channel), rxid, txid)
+        except Exception as exc:
+            self._opening.discard(channel)
+            self.daemon.rxids.discard(rxid)
+            if not self.closed:
+                self.send_message(CLOSED, channel, str(exc).encode())
+            return
+        self._opening.discard(channel)
+        if self.closed:
+            # Client went away while opening
+            self.daemon.rxids.discard(rxid)
+            transport.close()
+            return
+        self.channels[channel] = (transport, rxid)
+        if self.writing_paused:
+            transport.pause_reading()
+        self.send_message(OPENED, channel)
+
+    def _close_channel(self, channel):
+        transport, rxid = self.channels.pop(channel)
+        self.daemon.rxids.discard(rxid)
+        transport.close()
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        for channel in list(self.channels):
+            self._close_channel(channel)
+
+    def pause_writing(self):
+        # Make senders on the bus wait until the client has caught up
+        self.writing_paused = True
+        for transport, _ in self.channels.values():
+            transport.pause_reading()
+
+    def resume_writing(self):
+        self.writing_paused = False
+        for transport, _ in self.channels.values():
+            transport.resume_reading()
+
+    def throttle(self):
+        self._throttled += 1
+        if self._throttled == 1 and not self.closed:
+            self.transport.pause_reading()
+
+    def unthrottle(self):
+        self._throttled -= 1
+        if self._throttled == 0 and not self.closed:
+            self.transport.resume_reading()
+
+
+class _Forwarder(asyncio.Protocol):
+    """Forwards received PDUs on one ISO-TP connection to a client."""
+
+    def __init__(self, handler, channel):
+        self.handler = handler
+        self.channel = channel
+        self.throttled = False
+
+    def data_received(self, data):
+        handler = self.handler
+        if handler.closed:
+            return
+        if handler.transport.get_write_buffer_size() > handler.daemon.max_buffer:
+            LOGGER.warning('Client is not reading, disconnecting')
+            handler.transport.abort()
+            return
+        handler.send_message(DATA, self.channel, data)
+
+    def throttle(self):
+        if not self.throttled:
+            self.throttled = True
+            self.handler.throttle()
+
+    def resume_writing(self):
+        # Everything queued has been sent
+        if self.throttled:
+            self.throttled = False
+            self.handler.unthrottle()
+
+    def connection_lost(self, exc):
+        handler = self.handler
+        self.resume_writing()
+        if exc is not None and self.channel in handler.channels:
+            _, rxid = handler.channels.pop(self.channel)
+            handler.daemon.rxids.discard(rxid)
+            if not handler.closed:
+                handler.send_message(CLOSED, self.channel, str(exc).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Share a CAN interface for ISO-TP between processes.')
+    parser.add_argument('-i', '--interface', required=True,
+                        help='python-can interface')
+    parser.add_argument('-c', '--channel', required=True,
+                        help='python-can channel')
+    parser.add_argument('-s', '--socket', default='/tmp/aioisotp.sock',
+                        help='path of Unix socket to listen on')
+    parser.add_argument('-b', '--bitrate', type=int,
+                        help='bit rate of CAN bus')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+    config = {}
+    if args.bitrate:
+        config['bitrate'] = args.bitrate
+
+    loop = asyncio.get_event_loop()
+    network = ISOTPNetwork(args.channel, interface=args.interface,
+                           loop=loop, **config)
+    with network.open():
+        daemon = ISOTPDaemon(network, args.socket)
+        loop.run_until_complete(daemon.start())
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            daemon.close()
+
+
+if __name__ == '__main__':
+    main()
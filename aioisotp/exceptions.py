@@ -2,3 +2,29 @@
 
 class ISOTPError(Exception):
     pass
+
+
+class ISOTPTimeoutError(ISOTPError):
+    """The other side did not respond in time."""
+
+
+class ISOTPOverflowError(ISOTPError):
+    """The receiver reported that the PDU is too large."""
+
+
+class ISOTPWaitOverrunError(ISOTPError):
+    """The receiver sent more wait frames than allowed."""
+
+
+class NegativeResponseError(ISOTPError):
+    """A UDS service was rejected by the ECU.
+
+    :param int service: Request service ID.
+    :param int code: Negative response code.
+    """
+
+    def __init__(self, service, code):
+        super().__init__('Service 0x%02X rejected with code 0x%02X' %
+                         (service, code))
+        self.service = service
+        self.code = code
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import mmap
+import zlib
+
+from .exceptions import ISOTPError, ISOTPTimeoutError, NegativeResponseError
+
+
+LOGGER = logging.getLogger(__name__)
+
+REQUEST_DOWNLOAD = 0x34
+TRANSFER_DATA = 0x36
+REQUEST_TRANSFER_EXIT = 0x37
+NEGATIVE_RESPONSE = 0x7F
+RESPONSE_PENDING = 0x78
+
+
+class _UDSProtocol(asyncio.Protocol):
+
+    def __init__(self):
+        self.transport = None
+        self.responses = asyncio.Queue()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.responses.put_nowait(data)
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            self.responses.put_nowait(exc)
+
+
+class Flasher:
+    """Downloads an image to an ECU using UDS RequestDownload,
+    TransferData and RequestTransferExit.
+
+    Each TransferData block is sent straight from the image without
+    copying, and the next block is sliced and added to the CRC while the
+    current one is being sent. The wait for a response starts when the
+    last frame of the request has been sent, and pending responses (0x78)
+    extend it to *pending_timeout*.
+
+    Any other preparation of the ECU, like switching session and security
+    access, can be done with :meth:`request` before :meth:`run`::
+
+        flasher = Flasher(network, 0x7E8, 0x7E0, 'app.bin', 0x8000)
+        await flasher.request(b'\\x10\\x02')
+        await flasher.run()
+        print(flasher.rate)
+
+    :param aioisotp.ISOTPNetwork network:
+        An opened network.
+    :param int rxid:
+        CAN ID to receive responses from.
+    :param int txid:
+        CAN ID to send requests to.
+    :param image:
+        Path to a file to map into memory, or a bytes-like object
+        such as an :class:`mmap.mmap`.
+    :param int address:
+        Memory address to download to.
+    :param int data_format:
+        dataFormatIdentifier for compression and encryption.
+    :param int address_format:
+        addressAndLengthFormatIdentifier, number of bytes used for size
+        (high nibble) and address (low nibble).
+    :param int block_size:
+        Max number of data bytes per TransferData, at least 1, if smaller
+        than what the ECU allows.
+    :param float timeout:
+        Seconds to wait for a response (P2).
+    :param float pending_timeout:
+        Seconds to wait after a pending response (P2*).
+    """
+
+    def __init__(self, network, rxid, txid, image, address, data_format=0,
+                 address_format=0x44, block_size=None, timeout=1.0,
+                 pending_timeout=5.0):
+        assert block_size is None or block_size >= 1
+        self.network = network
+        self.rxid = rxid
+        self.txid = txid
+        self.image = image
+        self.address = address
+        self.data_format = data_format
+        self.address_format = address_format
+        self.block_size = block_size
+        self.timeout = timeout
+        self.pending_timeout = pending_timeout
+        #: CRC-32 of the data sent so far
+        self.crc = 0
+        #: Number of image bytes acknowledged by the ECU
+        self.bytes_sent = 0
+        #: Seconds from RequestDownload until RequestTransferExit was answered
+        self.elapsed = None
+        self._loop = network._loop
+        self._transport = None
+        self._protocol = None
+
+    @property
+    def rate(self):
+        """Achieved download speed in bytes per second."""
+        if not self.elapsed:
+            return 0.0
+        return self.bytes_sent / self.elapsed
+
+    async def connect(self):
+        """Open the connection to the ECU if not already open.
+
+        This method is a *coroutine*.
+        """
+        if self._transport is None or self._transport.is_closing():
+            self._transport, self._protocol = \
+                await self.network.create_connection(
+                    _UDSProtocol, self.rxid, self.txid)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def request(self, *buffers):
+        """Send a request and wait for the positive response.
+
+        This method is a *coroutine*.
+
+        :param buffers:
+            Request payload, possibly split over several buffers.
+        :returns: Response payload.
+        :rtype: bytes
+        :raises aioisotp.NegativeResponseError:
+            If the ECU rejected the request.
+        :raises aioisotp.ISOTPTimeoutError:
+            If the ECU did not respond in time.
+        """
+        await self.connect()
+        sent = self._send(buffers)
+        return await self._wait_response(memoryview(buffers[0])[0], sent)
+
+    def _send(self, buffers):
+        """Queue a request.
+
+        :returns:
+            A future for when it has been sent, or `None` if the transport
+            can not tell.
+        """
+        transport = self._transport
+        if hasattr(transport, 'send'):
+            return transport.send(*buffers)
+        transport.writelines(buffers)
+        return None
+
+    async def _wait_response(self, service, sent=None):
+        if sent is not None:
+            # P2 starts when the whole request has been sent
+            await sent
+        timeout = self.timeout
+        while True:
+            try:
+                response = await asyncio.wait_for(
+                    self._protocol.responses.get(), timeout)
+            except asyncio.TimeoutError:
+                raise ISOTPTimeoutError(
+                    'No response to service 0x%02X' % service)
+            if isinstance(response, Exception):
+                raise response
+            if response[0] == service + 0x40:
+                return response
+            if (len(response) >= 3 and response[0] == NEGATIVE_RESPONSE and
+                    response[1] == service):
+                if response[2] != RESPONSE_PENDING:
+                    raise NegativeResponseError(service, response[2])
+                timeout = self.pending_timeout
+            else:
+                LOGGER.debug('Unexpected response ignored')
+
+    async def run(self):
+        """Download the image.
+
+        This method is a *coroutine*.
+
+        :returns: CRC-32 of the image.
+        :raises aioisotp.ISOTPError:
+            If the transfer failed or the ECU responded with something
+            unusable.
+        """
+        image = self.image
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                # Unmapped when no longer referenced
+                image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(image).cast('B')
+        try:
+            await self.connect()
+            start = self._loop.time()
+            block_size = await self._request_download(view.nbytes)
+            await self._transfer(view, block_size)
+            await self.request(bytes([REQUEST_TRANSFER_EXIT]))
+            self.elapsed = self._loop.time() - start
+        finally:
+            self.close()
+        LOGGER.info('Downloaded %d bytes to ECU 0x%X in %.2f s (%.0f B/s)',
+                    self.bytes_sent, self.txid, self.elapsed, self.rate)
+        return self.crc
+
+    async def _request_download(self, size):
+        size_length = self.address_format >> 4
+        address_length = self.address_format & 0xF
+        response = await self.request(
+            bytes([REQUEST_DOWNLOAD, self.data_format, self.address_format]),
+            self.address.to_bytes(address_length, 'big'),
+            size.to_bytes(size_length, 'big'))
+        length = response[1] >> 4 if len(response) >= 2 else 0
+        if length == 0 or len(response) < 2 + length:
+            raise ISOTPError('Malformed RequestDownload response')
+        max_length = int.from_bytes(response[2:2 + length], 'big')
+        # Service ID and block sequence counter are included
+        if max_length <= 2:
+            raise ISOTPError('ECU allows no data per TransferData '
+                             '(maxNumberOfBlockLength %d)' % max_length)
+        block_size = max_length - 2
+        if self.block_size is not None:
+            block_size = min(block_size, self.block_size)
+        LOGGER.debug('Transferring %d bytes in blocks of %d bytes',
+                     size, block_size)
+        return block_size
+
+    async def _transfer(self, view, block_size):
+        self.crc = 0
+        self.bytes_sent = 0
+        counter = 1
+        offset = block_size
+        block = view[:block_size]
+        while block:
+            header = bytes([TRANSFER_DATA, counter])
+            sent = self._send((header, block))
+            # Prepare next block while this one is being sent
+            self.crc = zlib.crc32(block, self.crc)
+            next_block = view[offset:offset + block_size]
+            offset += block_size
+            counter = (counter + 1) & 0xFF
+
+            response = await self._wait_response(TRANSFER_DATA, sent)
+            if len(response) < 2 or response[1] != header[1]:
+                raise ISOTPError('Wrong block sequence counter in response')
+            self.bytes_sent += len(block)
+            block = next_block
+
+
+async def flash_all(flashers):
+    """Run several :class:`Flasher` at once.
+
+    ECUs on the same network share the bus, so the transfers are
+    interleaved frame by frame. A failure for one ECU does not stop the
+    others.
+
+    This function is a *coroutine*.
+
+    :returns:
+        A list with the CRC or the exception for each flasher.
+    """
+    results = await asyncio.gather(*(flasher.run() for flasher in flashers),
+                                   return_exceptions=True)
+    for flasher, result in zip(flashers, results):
+        if isinstance(result, Exception):
+            LOGGER.error('Download to ECU 0x%X failed: %s',
+                         flasher.txid, result)
+    return results
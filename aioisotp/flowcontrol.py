@@ -0,0 +1,99 @@
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveFlowControl:
+    """Tunes the block size and STmin advertised to one sender.
+
+    Starts at the fastest allowed settings. Every lost consecutive frame
+    or reception timeout doubles STmin, or halves the block size once
+    STmin has reached its maximum.
+    After a number of blocks received without problems, STmin is
+    lowered by 1 ms, or the block size increased by one when STmin is
+    already at its minimum. The number of blocks required doubles with
+    every back-off, so that settings which caused problems are retried
+    less often, and halves with every speed-up, so that a few problems
+    over a long session do not keep a fast sender slow. Blocks with long gaps between frames are
+    taken as a sign of a struggling sender and lower the block size by one.
+
+    Give :class:`AdaptiveFlowControl` (or a :func:`functools.partial` of it)
+    as *flow_control* to :class:`~aioisotp.ISOTPNetwork` to use it for
+    every connection.
+
+    :param int min_block_size:
+        Smallest block size to advertise, at least 1.
+    :param int max_block_size:
+        Largest block size to advertise, at most 255.
+    :param int min_st_min:
+        Smallest STmin in milliseconds.
+    :param int max_st_min:
+        Largest STmin in milliseconds, at most 127.
+    :param int increase_after:
+        Number of good blocks in a row before speeding up.
+    :param float max_gap:
+        Gap in seconds between two consecutive frames in a block, on top
+        of STmin, above which the block does not count as good.
+    """
+
+    def __init__(self, min_block_size=1, max_block_size=64, min_st_min=0,
+                 max_st_min=20, increase_after=4, max_gap=0.05):
+        assert 1 <= min_block_size <= max_block_size <= 0xFF
+        assert 0 <= min_st_min <= max_st_min <= 0x7F
+        self.min_block_size = min_block_size
+        self.max_block_size = max_block_size
+        self.min_st_min = min_st_min
+        self.max_st_min = max_st_min
+        self.increase_after = increase_after
+        self.max_gap = max_gap
+        #: Block size to advertise in the next flow control frame
+        self.block_size = max_block_size
+        #: STmin to advertise in the next flow control frame
+        self.st_min = min_st_min
+        self._good_blocks = 0
+        self._required_blocks = increase_after
+
+    def block_received(self, gap):
+        """Called when a block or a whole PDU has been received.
+
+        :param float gap:
+            Longest time in seconds between two consecutive frames.
+        """
+        if gap > self.max_gap + self.st_min * 1e-3:
+            self._good_blocks = 0
+            if self.block_size > self.min_block_size:
+                self.block_size -= 1
+                LOGGER.debug('Slow sender, block size lowered to %d',
+                             self.block_size)
+            return
+        self._good_blocks += 1
+        if self._good_blocks < self._required_blocks:
+            return
+        self._good_blocks = 0
+        if self.st_min > self.min_st_min:
+            self.st_min -= 1
+        elif self.block_size < self.max_block_size:
+            self.block_size += 1
+        else:
+            return
+        self._required_blocks = max(self._required_blocks // 2,
+                                    self.increase_after)
+
+    def frame_lost(self):
+        """Called when a consecutive frame is missing."""
+        self._back_off()
+
+    def timed_out(self):
+        """Called when the sender stopped sending in the middle of a PDU."""
+        self._back_off()
+
+    def _back_off(self):
+        self._good_blocks = 0
+        self._required_blocks = min(self._required_blocks * 2, 0x10000)
+        if self.st_min < self.max_st_min:
+            self.st_min = min(max(self.st_min * 2, 1), self.max_st_min)
+        else:
+            self.block_size = max(self.block_size // 2, self.min_block_size)
+        LOGGER.info('Backing off to block size %d and STmin %d ms',
+                    self.block_size, self.st_min)
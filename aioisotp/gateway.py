@@ -0,0 +1,192 @@
+import asyncio
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ISOTPGateway:
+    """Routes ISO-TP traffic between two networks.
+
+    PDUs are forwarded cut-through: the outgoing first frame is sent as
+    soon as the incoming first frame has been received, and consecutive
+    frames are forwarded as they arrive. Each side negotiates its own flow
+    control.
+
+    When more than *max_buffer* bytes have been received but not yet sent,
+    the incoming sender is told to wait at its next block boundary. This
+    requires a block size other than 0 on the receiving network, and a
+    sender which accepts wait frames. Senders using aioisotp accept
+    *max_wft* of them in a row, 10 by default. Set it higher if the
+    outgoing side is much slower than the incoming side::
+
+        tester = ISOTPNetwork('can0', 'socketcan', max_wft=100)
+        gateway = ISOTPGateway(
+            ISOTPNetwork('can0', 'socketcan', block_size=8),
+            ISOTPNetwork('can1', 'socketcan', block_size=8))
+
+    Connections which only deliver complete PDUs, like SocketCAN ISO-TP
+    sockets, are forwarded using store-and-forward instead.
+
+    :param aioisotp.ISOTPNetwork network_a:
+        First network.
+    :param aioisotp.ISOTPNetwork network_b:
+        Second network.
+    :param int max_buffer:
+        Max number of bytes to buffer per PDU before pausing the sender.
+    :param float timeout:
+        Abort a forwarded PDU if no frames have been received for this
+        many seconds.
+    """
+
+    def __init__(self, network_a, network_b, max_buffer=256, timeout=1.0):
+        self.network_a = network_a
+        self.network_b = network_b
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+        self._routes = []
+
+    async def add_route(self, rxid_a, txid_a, rxid_b, txid_b):
+        """Forward PDUs in both directions between two pairs of CAN IDs.
+
+        PDUs received with *rxid_a* on network A are sent with *txid_b* on
+        network B and PDUs received with *rxid_b* on network B are sent
+        with *txid_a* on network A.
+
+        This method is a *coroutine*.
+        """
+        end_a = _RouteEnd(self, self.network_a._loop)
+        end_b = _RouteEnd(self, self.network_b._loop)
+        end_a.peer = end_b
+        end_b.peer = end_a
+        await self.network_a.create_connection(lambda: end_a, rxid_a, txid_a)
+        await self.network_b.create_connection(lambda: end_b, rxid_b, txid_b)
+        self._routes.append((end_a, end_b))
+
+    def close(self):
+        """Close all routes."""
+        for route in self._routes:
+            for end in route:
+                end.transport.close()
+        self._routes = []
+
+
+class _RouteEnd(asyncio.Protocol):
+    """Receives PDUs on one network and forwards them to its peer.
+
+    Implements :meth:`get_buffer` and :meth:`buffer_updated` without
+    subclassing :class:`asyncio.BufferedProtocol`, which requires
+    Python 3.7.
+    """
+
+    def __init__(self, gateway, loop):
+        self.gateway = gateway
+        self.peer = None
+        self.transport = None
+        self._loop = loop
+        self._buffer = bytearray(4096)
+        # Outgoing PDU being forwarded
+        self._stream = None
+        # PDU being collected for store-and-forward
+        self._collected = None
+        self._paused = False
+        self._timeout_handle = None
+        self._last_activity = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def pdu_started(self, size):
+        out = self.peer.transport
+        if hasattr(out, 'write_stream'):
+            self._stream = out.write_stream(size)
+            self._stream.on_consumed = self._consumed
+            self._stream.on_abort = self._forward_aborted
+        else:
+            self._collected = bytearray()
+        self._restart_timer()
+
+    def get_buffer(self, sizehint):
+        return self._buffer
+
+    def buffer_updated(self, nbytes):
+        data = bytes(self._buffer[:nbytes])
+        if self._stream is not None:
+            self._stream.write(data)
+            if (not self._paused and
+                    self._stream.buffered > self.gateway.max_buffer):
+                self._paused = True
+                self.transport.pause_reading()
+            self._restart_timer()
+        elif self._collected is not None:
+            self._collected.extend(data)
+            self._restart_timer()
+        else:
+            # Whole PDUs from a transport without PDU boundaries
+            self.peer.transport.write(data)
+
+    def pdu_ended(self, exc):
+        self._stop_timer()
+        stream = self._stream
+        self._stream = None
+        if exc is not None:
+            if stream is not None:
+                LOGGER.info('Aborting forwarded PDU: %s', exc)
+                stream.abort()
+        elif self._collected is not None:
+            self.peer.transport.write(bytes(self._collected))
+        self._collected = None
+        self._resume()
+
+    def _consumed(self):
+        # Data moving on counts as activity
+        self._last_activity = self._loop.time()
+        if (self._paused and self._stream is not None and
+                self._stream.buffered <= self.gateway.max_buffer // 2):
+            self._resume()
+
+    def _resume(self):
+        if self._paused:
+            self._paused = False
+            self.transport.resume_reading()
+
+    def _forward_aborted(self, exc):
+        """The outgoing transfer failed, so stop the incoming one too."""
+        if self._stream is not None and self._stream.is_aborted:
+            LOGGER.info('Forwarding failed: %s', exc)
+            self._stream = None
+            self.transport.reject()
+
+    def _restart_timer(self):
+        self._last_activity = self._loop.time()
+        if self._timeout_handle is None:
+            self._timeout_handle = self._loop.call_later(
+                self.gateway.timeout, self._check_timeout)
+
+    def _stop_timer(self):
+        if self._timeout_handle is not None:
+            self._timeout_handle.cancel()
+            self._timeout_handle = None
+
+    def _check_timeout(self):
+        self._timeout_handle = None
+        if self._paused:
+            # Sender is waiting for us, not the other way round
+            self._restart_timer()
+            return
+        remaining = self._last_activity + self.gateway.timeout - self._loop.time()
+        if remaining > 0:
+            # Frames have been received since the timer was started
+            self._timeout_handle = self._loop.call_later(
+                remaining, self._check_timeout)
+            return
+        LOGGER.warning('Timeout while forwarding PDU')
+        if self._stream is not None:
+            self._stream.abort()
+        self.transport.reject()
+
+    def connection_lost(self, exc):
+        self._stop_timer()
+        if self._stream is not None:
+            self._stream.abort()
+            self._stream = None
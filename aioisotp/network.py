@@ -1,12 +1,16 @@
 import asyncio
 import binascii
 import logging
+import time
 
 import can
 
 from .transports.userspace import ISOTPTransport
 from .transports.socketcan import make_socketcan_transport
-from .transports.isotpserver import make_isotpserver_transport
+from .transports.isotpserver import ISOTPServerPool
+from .transports.daemon import DaemonClient
+from .simulation import SimulatedInterface
+from .busload import BusLoad
 from .constants import SINGLE_FRAME
 
 
@@ -35,40 +39,91 @@ class ISOTPNetwork(can.Listener):
         operation using `can-utils <https://github.com/linux-can/can-utils>`__
         isotpserver utility.
         The *channel* parameter should be set to `'host:port'`.
+        TCP connections are kept open and reused by later connections.
+
+        The 'daemon' interface connects to an
+        :class:`~aioisotp.daemon.ISOTPDaemon` which shares its CAN bus with
+        many processes. The *channel* parameter should be set to the path
+        of its Unix socket.
     :param can.BusABC bus:
         Existing python-can bus instance to use.
+        May also be an interface to a
+        :class:`~aioisotp.simulation.SimulatedBus`.
     :param int block_size:
         Block size for receiving frames. Set to 0 for unlimited block size.
         May be tuned depending on CAN interface capabilities.
     :param int st_min:
         Minimum separation time between received frames.
     :param int max_wft:
-        Maximum number of wait frames until signalling an error.
+        Maximum number of wait frames in a row from a receiver before a
+        transfer is aborted with :class:`~aioisotp.ISOTPWaitOverrunError`.
+        With 0, any wait frame aborts the transfer.
+    :param float fc_timeout:
+        Seconds to wait for a flow control frame when sending (N_Bs).
+        Not supported by the 'socketcan' interface.
+    :param float cf_timeout:
+        Seconds to wait for a consecutive frame when receiving (N_Cr).
+        Not supported by the 'socketcan' interface.
     :param int tx_padding:
         Used to fill the bytes of the sent data, `None` means no padding
     :param asyncio.AbstractEventLoop loop:
         Event loop to use. Defaults to :func:`asyncio.get_event_loop`.
+    :param bool preempt:
+        Abort a transfer in progress when a PDU with higher priority is
+        written to the same connection. The aborted PDU is sent again
+        afterwards, but is not preempted more than three times.
+    :param flow_control:
+        Callable returning a new
+        :class:`~aioisotp.flowcontrol.AdaptiveFlowControl` for each
+        connection, which then tunes the block size and STmin advertised
+        to its sender. *block_size* and *st_min* are not used in that case.
+        Not supported by the 'socketcan' interface.
+    :param aioisotp.busload.BusLoad bus_load:
+        Bus load estimator with thresholds for throttling senders.
+        By default the load is only estimated.
     """
 
     def __init__(self, channel=None, interface=None, bus=None,
-                 block_size=16, st_min=0, max_wft=0, tx_padding=0xcc,
-                 loop=None, **config):
+                 block_size=16, st_min=0, max_wft=10, tx_padding=0xcc,
+                 loop=None, preempt=False, flow_control=None, bus_load=None,
+                 fc_timeout=1.0, cf_timeout=1.0, **config):
         self.block_size = block_size
         self.st_min = st_min
         self.max_wft = max_wft
+        self.fc_timeout = fc_timeout
+        self.cf_timeout = cf_timeout
         self.tx_padding = tx_padding
+        self.preempt = preempt
+        self.flow_control = flow_control
         self.channel = channel
         self.interface = interface
         self.config = config
         self.bus = bus
+        self.notifier = None
+        if bus_load is None:
+            if isinstance(bus, SimulatedInterface):
+                bitrate = bus.simulated_bus.bitrate
+            else:
+                bitrate = config.get('bitrate', 500000)
+            bus_load = BusLoad(bitrate)
+        #: A :class:`~aioisotp.busload.BusLoad` with the current estimate
+        #: based on frames sent and received by this network
+        self.bus_load = bus_load
+        self._clock = time.time
         self._rxids = {}
+        self._isotpserver_pool = None
+        self._daemon_client = None
         if loop is None:
             loop = asyncio.get_event_loop()
         self._loop = loop
 
     def open(self):
         """Open connection to CAN bus and start receiving messages."""
-        if self.interface != 'isotpserver':
+        if isinstance(self.bus, SimulatedInterface):
+            # Messages are delivered from the event loop directly
+            self.bus.listener = self
+            self._clock = self._loop.time
+        elif self.interface not in ('isotpserver', 'daemon'):
             if self.bus is None:
                 self.bus = can.Bus(self.channel,
                                 bustype=self.interface,
@@ -80,8 +135,14 @@ class ISOTPNetwork(can.Listener):
         """Disconnect from CAN bus."""
         if self.notifier is not None:
             self.notifier.stop()
+            self.notifier = None
+        if self.bus is not None:
             self.bus.shutdown()
         self.bus = None
+        if self._isotpserver_pool is not None:
+            self._isotpserver_pool.close()
+        if self._daemon_client is not None:
+            self._daemon_client.close()
 
     def __enter__(self):
         return self
@@ -104,6 +165,8 @@ class ISOTPNetwork(can.Listener):
 
         :param protocol_factory:
             Must be a callable returning a :class:`asyncio.Protocol` instance.
+            An :class:`asyncio.BufferedProtocol` may be used to receive
+            large PDUs as a stream of frames rather than as a whole.
         :param int rxid:
             CAN ID to receive messages from.
         :param int txid:
@@ -118,20 +181,40 @@ class ISOTPNetwork(can.Listener):
                 LOGGER.info('Could not use SocketCAN ISO-TP: %s', exc)
         elif self.interface == 'isotpserver':
             host, port = self.channel.split(':')
-            return await make_isotpserver_transport(
-                protocol_factory, host, int(port), self._loop)
+            if self._isotpserver_pool is None:
+                self._isotpserver_pool = ISOTPServerPool(self._loop)
+            return await self._isotpserver_pool.create_connection(
+                protocol_factory, host, int(port))
+        elif self.interface == 'daemon':
+            if self._daemon_client is None:
+                self._daemon_client = DaemonClient(self.channel, self._loop)
+            return await self._daemon_client.create_connection(
+                protocol_factory, rxid, txid)
 
         return self._make_userspace_transport(protocol_factory, rxid, txid)
 
     def _make_userspace_transport(self, protocol_factory, rxid, txid):
         protocol = protocol_factory()
         send_cb = lambda data: self.send_raw(txid, data)
+        close_cb = lambda: self._remove_transport(rxid, transport)
+        flow_control = None
+        if self.flow_control is not None:
+            flow_control = self.flow_control()
         transport = ISOTPTransport(protocol, send_cb,
                                    self.block_size, self.st_min, self.max_wft,
-                                   loop=self._loop)
+                                   loop=self._loop, preempt=self.preempt,
+                                   clock=self._clock, close_cb=close_cb,
+                                   fc_timeout=self.fc_timeout,
+                                   cf_timeout=self.cf_timeout,
+                                   flow_control=flow_control,
+                                   throttle=self.bus_load)
         self._rxids[rxid] = transport
         return transport, protocol
 
+    def _remove_transport(self, rxid, transport):
+        if self._rxids.get(rxid) is transport:
+            del self._rxids[rxid]
+
     async def open_connection(self, rxid, txid):
         """A wrapper for :meth:`create_connection` returning a
         (reader, writer) pair.
@@ -181,14 +264,16 @@ class ISOTPNetwork(can.Listener):
                           extended_id=txid > 0x7FF,
                           data=data)
         self.bus.send(msg)
+        self.bus_load.add(msg, self._loop.time())
 
     def on_message_received(self, msg):
+        self.bus_load.add(msg, self._loop.time())
         if msg.is_error_frame or msg.is_remote_frame:
             return
 
         transport = self._rxids.get(msg.arbitration_id)
         if transport is not None:
-            transport.feed_data(msg.data)
+            transport.feed_data(msg.data, msg.timestamp)
 
     def on_error(self, exc):
         for transport in self._rxids.values():
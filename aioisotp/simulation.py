@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import selectors
+
+import can
+
+from .busload import frame_bits
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Selector that advances virtual time instead of blocking."""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self.loop = None
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        if timeout is None:
+            # Nothing is scheduled so wait for real I/O,
+            # e.g. a call_soon_threadsafe() from another thread
+            return self._selector.select(None)
+        events = self._selector.select(0)
+        if not events and timeout > 0:
+            # Jump directly to the next scheduled callback
+            self.loop.advance(timeout)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """An event loop where time only advances when there is nothing else
+    to do.
+
+    Scheduled callbacks run in the same order and at the same
+    (virtual) times as they would in a real loop, but waiting is instant.
+    Real I/O still works, but time spent waiting for it is not counted.
+
+    :param float start:
+        Initial value of :meth:`time`.
+    """
+
+    def __init__(self, start=0.0):
+        self._time = start
+        selector = _VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+
+    def time(self):
+        return self._time
+
+    def advance(self, seconds):
+        """Move virtual time forward.
+
+        :param float seconds:
+            Number of seconds to advance.
+        """
+        self._time += seconds
+
+
+class SimulatedBus:
+    """A CAN bus shared by several simulated interfaces.
+
+    Frames are transmitted one at a time with lowest arbitration ID first,
+    each one occupying the bus for its nominal duration at the given bit
+    rate. Received frames are timestamped using the event loop's clock.
+
+    Use together with :class:`VirtualClockLoop` for fast and reproducible
+    timing::
+
+        loop = VirtualClockLoop()
+        bus = SimulatedBus(loop=loop)
+        tester = ISOTPNetwork(bus=bus.create_interface(), loop=loop)
+        ecu = ISOTPNetwork(bus=bus.create_interface(), loop=loop)
+
+    :param int bitrate:
+        Bit rate in bits per second.
+    :param asyncio.AbstractEventLoop loop:
+        Event loop to use. Defaults to :func:`asyncio.get_event_loop`.
+    """
+
+    def __init__(self, bitrate=500000, loop=None):
+        self.bitrate = bitrate
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._interfaces = []
+        # Heap of (arbitration_id, order, msg, sender) waiting for the bus
+        self._pending = []
+        self._order = itertools.count()
+        self._busy = False
+
+    def create_interface(self, channel='simulated', **kwargs):
+        """Connect a new interface to the bus.
+
+        Keyword arguments are passed to :class:`SimulatedInterface`.
+
+        :rtype: aioisotp.simulation.SimulatedInterface
+        """
+        interface = SimulatedInterface(self, channel, **kwargs)
+        self._interfaces.append(interface)
+        return interface
+
+    def remove_interface(self, interface):
+        if interface in self._interfaces:
+            self._interfaces.remove(interface)
+
+    def transmit(self, msg, sender=None):
+        """Queue a frame for transmission on the bus.
+
+        :param can.Message msg:
+            Frame to send.
+        :param sender:
+            Interface that should not receive its own frame.
+        """
+        heapq.heappush(self._pending,
+                       (msg.arbitration_id, next(self._order), msg, sender))
+        if not self._busy:
+            self._start_next()
+
+    def _start_next(self):
+        if not self._pending:
+            self._busy = False
+            return
+        self._busy = True
+        _, _, msg, sender = heapq.heappop(self._pending)
+        duration = frame_bits(msg) / self.bitrate
+        self._loop.call_later(duration, self._end_frame, msg, sender)
+
+    def _end_frame(self, msg, sender):
+        msg.timestamp = self._loop.time()
+        for interface in list(self._interfaces):
+            if interface is not sender or interface.receive_own_messages:
+                interface.deliver(msg)
+        self._start_next()
+
+
+class SimulatedInterface(can.BusABC):
+    """A python-can bus connected to a :class:`SimulatedBus`.
+
+    Created using :meth:`SimulatedBus.create_interface`. Received frames
+    are passed directly to :attr:`listener` from the event loop, so an
+    :class:`~aioisotp.ISOTPNetwork` using it does not need a
+    :class:`can.Notifier`.
+    """
+
+    def __init__(self, bus, channel='simulated', receive_own_messages=False,
+                 **kwargs):
+        super().__init__(channel, **kwargs)
+        self.channel_info = 'Simulated CAN bus: %s' % channel
+        self.simulated_bus = bus
+        self.receive_own_messages = receive_own_messages
+        #: A :class:`can.Listener` receiving all frames
+        self.listener = None
+
+    def send(self, msg, timeout=None):
+        self.simulated_bus.transmit(msg, self)
+
+    def deliver(self, msg):
+        if self.listener is not None and self._matches_filters(msg):
+            self.listener.on_message_received(msg)
+
+    def _recv_internal(self, timeout):
+        # Frames are only delivered to the listener
+        return None, False
+
+    def shutdown(self):
+        self.simulated_bus.remove_interface(self)
+        self.listener = None
@@ -0,0 +1,316 @@
+"""Long running stress test on a simulated CAN bus.
+
+Testers send PDUs of random sizes to echo servers while random and
+malformed frames are injected and servers go away and come back. Since
+the bus runs on a :class:`~aioisotp.simulation.VirtualClockLoop`, hours
+of traffic take a fraction of that in real time.
+
+Throughput, memory use, live transports and scheduled callbacks are
+sampled periodically. The run fails if any of them drift beyond the
+given limits after the warm-up period, or if an exception escapes into
+the event loop::
+
+    $ python -m aioisotp.soak --hours 8 --pairs 4
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import sys
+
+import can
+
+from .network import ISOTPNetwork
+from .simulation import VirtualClockLoop, SimulatedBus
+from .transports.userspace import ISOTPTransport
+from .exceptions import ISOTPError
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def rss():
+    """Current resident set size in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Not available on Windows
+        import resource
+        # Peak rather than current size, but still shows growth
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class Sample:
+
+    __slots__ = ('time', 'throughput', 'rss', 'transports', 'handles')
+
+    def __init__(self, time, throughput, rss, transports, handles):
+        self.time = time
+        self.throughput = throughput
+        self.rss = rss
+        self.transports = transports
+        self.handles = handles
+
+
+class _Echo(asyncio.Protocol):
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+
+class _Tester(asyncio.Protocol):
+
+    def __init__(self):
+        self.responses = asyncio.Queue()
+
+    def data_received(self, data):
+        self.responses.put_nowait(data)
+
+
+class SoakTest:
+    """Drives testers and echo servers on a simulated bus.
+
+    :param int pairs:
+        Number of tester and echo server pairs.
+    :param float duration:
+        Virtual seconds to run.
+    :param float sample_interval:
+        Virtual seconds between samples.
+    :param float fuzz_rate:
+        Random frames injected per virtual second.
+    :param float drop_interval:
+        Mean virtual seconds between an echo server going away.
+    :param int seed:
+        Seed for the random number generator.
+    """
+
+    def __init__(self, pairs=4, duration=3600.0, sample_interval=60.0,
+                 fuzz_rate=20.0, drop_interval=30.0, seed=0):
+        self.pairs = pairs
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.fuzz_rate = fuzz_rate
+        self.drop_interval = drop_interval
+        self.random = random.Random(seed)
+        self.loop = VirtualClockLoop()
+        self.bus = SimulatedBus(loop=self.loop)
+        #: List of :class:`Sample`
+        self.samples = []
+        #: Exceptions that escaped into the event loop
+        self.errors = []
+        self.bytes_echoed = 0
+        self.requests = 0
+        self.failures = 0
+        self._running = True
+        self._ids = []
+
+    def run(self):
+        """Run the test until *duration* has passed.
+
+        :returns: List of samples.
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.set_exception_handler(self._exception_handler)
+        try:
+            self.loop.run_until_complete(self._main())
+        finally:
+            asyncio.set_event_loop(None)
+            self.loop.close()
+        return self.samples
+
+    def _exception_handler(self, loop, context):
+        self.errors.append(context)
+        loop.default_exception_handler(context)
+
+    async def _main(self):
+        tester_net = ISOTPNetwork(bus=self.bus.create_interface(),
+                                  loop=self.loop).open()
+        ecu_net = ISOTPNetwork(bus=self.bus.create_interface(),
+                               loop=self.loop, block_size=8).open()
+        fuzzer = self.bus.create_interface()
+        tasks = []
+        for i in range(self.pairs):
+            ecu_rxid = 0x700 + 2 * i
+            tester_rxid = ecu_rxid + 1
+            self._ids.extend([ecu_rxid, tester_rxid])
+            tasks.append(self.loop.create_task(
+                self._run_ecu(ecu_net, ecu_rxid, tester_rxid)))
+            tasks.append(self.loop.create_task(
+                self._run_tester(tester_net, tester_rxid, ecu_rxid)))
+        if self.fuzz_rate:
+            tasks.append(self.loop.create_task(self._run_fuzzer(fuzzer)))
+        await self._sample_until_done()
+        self._running = False
+        await asyncio.gather(*tasks)
+        tester_net.close()
+        ecu_net.close()
+        fuzzer.shutdown()
+
+    async def _sample_until_done(self):
+        start = self.loop.time()
+        last_bytes = 0
+        while self.loop.time() - start < self.duration:
+            await asyncio.sleep(self.sample_interval)
+            gc.collect()
+            sample = Sample(
+                self.loop.time() - start,
+                (self.bytes_echoed - last_bytes) / self.sample_interval,
+                rss(),
+                sum(1 for obj in gc.get_objects()
+                    if isinstance(obj, ISOTPTransport)),
+                self._live_handles())
+            last_bytes = self.bytes_echoed
+            self.samples.append(sample)
+            LOGGER.info('%6.0f s: %7.0f B/s, RSS %5.1f MB, '
+                        '%d transports, %d handles',
+                        sample.time, sample.throughput, sample.rss / 1e6,
+                        sample.transports, sample.handles)
+
+    def _live_handles(self):
+        # Cancelled timers stay scheduled until they are due
+        return (sum(1 for handle in self.loop._scheduled
+                    if not handle.cancelled()) +
+                len(self.loop._ready))
+
+    async def _run_ecu(self, network, rxid, txid):
+        while self._running:
+            transport, _ = await network.create_connection(_Echo, rxid, txid)
+            await asyncio.sleep(self.random.expovariate(1 / self.drop_interval))
+            # Go away in the middle of whatever is going on
+            transport.close()
+            await asyncio.sleep(self.random.uniform(0, 2))
+
+    async def _run_tester(self, network, rxid, txid):
+        transport, protocol = await network.create_connection(
+            _Tester, rxid, txid)
+        while self._running:
+            if self.random.random() < 0.01:
+                size = self.random.randint(4096, 20000)
+            else:
+                size = self.random.randint(1, 4095)
+            payload = self.random.getrandbits(8 * size).to_bytes(size, 'big')
+            self.requests += 1
+            try:
+                await transport.send(payload)
+                while True:
+                    response = await asyncio.wait_for(
+                        protocol.responses.get(), 1.0)
+                    # Skip late responses to earlier requests
+                    if response == payload:
+                        break
+            except (ISOTPError, asyncio.TimeoutError):
+                self.failures += 1
+            else:
+                self.bytes_echoed += size
+        transport.close()
+
+    async def _run_fuzzer(self, interface):
+        rnd = self.random
+        while self._running:
+            await asyncio.sleep(rnd.expovariate(self.fuzz_rate))
+            if rnd.random() < 0.5:
+                # Garbage, including invalid frame types and lengths
+                data = bytes(rnd.getrandbits(8)
+                             for _ in range(rnd.randint(0, 8)))
+            else:
+                # Valid looking frame with wrong contents
+                pci = rnd.choice((0x00, 0x10, 0x20, 0x30))
+                data = bytes([pci | rnd.getrandbits(4)] +
+                             [rnd.getrandbits(8) for _ in range(7)])
+            interface.send(can.Message(arbitration_id=rnd.choice(self._ids),
+                                       data=data, extended_id=False))
+
+
+def check_drift(samples, warmup=0.1, max_rss_growth=20e6,
+                max_transports=None, max_handles=None):
+    """Check samples for resources growing over time.
+
+    Samples taken during the first *warmup* share of the run are used
+    as baseline.
+
+    :returns: List of problems found, empty if none.
+    """
+    problems = []
+    baseline = samples[:max(1, int(len(samples) * warmup))]
+    rest = samples[len(baseline):]
+    if not rest:
+        return problems
+    rss_growth = max(s.rss for s in rest) - max(s.rss for s in baseline)
+    if rss_growth > max_rss_growth:
+        problems.append('RSS grew by %.1f MB' % (rss_growth / 1e6))
+    if max_transports is None:
+        max_transports = max(s.transports for s in baseline)
+    most = max(s.transports for s in rest)
+    if most > max_transports:
+        problems.append('%d live transports, limit is %d' %
+                        (most, max_transports))
+    if max_handles is None:
+        max_handles = 2 * max(s.handles for s in baseline) + 10
+    most = max(s.handles for s in rest)
+    if most > max_handles:
+        problems.append('%d scheduled callbacks, limit is %d' %
+                        (most, max_handles))
+    if not any(s.throughput for s in rest[-3:]):
+        problems.append('No data got through at the end of the run')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Stress test ISO-TP on a simulated CAN bus.')
+    parser.add_argument('--hours', type=float, default=1.0,
+                        help='virtual hours to run')
+    parser.add_argument('--pairs', type=int, default=4,
+                        help='number of tester and server pairs')
+    parser.add_argument('--interval', type=float, default=60.0,
+                        help='virtual seconds between samples')
+    parser.add_argument('--fuzz-rate', type=float, default=20.0,
+                        help='random frames per virtual second')
+    parser.add_argument('--drop-interval', type=float, default=30.0,
+                        help='mean virtual seconds between server drops')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-rss-growth', type=float, default=20.0,
+                        help='max RSS growth in MB after warm-up')
+    parser.add_argument('--max-transports', type=int,
+                        help='max live transports (default 3 per pair)')
+    parser.add_argument('--max-handles', type=int,
+                        help='max scheduled callbacks (default from warm-up)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='also log ISO-TP errors and warnings')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not args.verbose:
+        # Injected frames and dropped servers cause lots of errors
+        logging.getLogger('aioisotp.transports').setLevel(logging.CRITICAL)
+
+    test = SoakTest(args.pairs, args.hours * 3600, args.interval,
+                    args.fuzz_rate, args.drop_interval, args.seed)
+    samples = test.run()
+    # Servers which are closing may still be alive when replaced
+    max_transports = args.max_transports or 3 * args.pairs
+    problems = check_drift(samples, max_rss_growth=args.max_rss_growth * 1e6,
+                           max_transports=max_transports,
+                           max_handles=args.max_handles)
+    if test.errors:
+        problems.append('%d unhandled exceptions in event loop' %
+                        len(test.errors))
+    print('%d requests, %d failed, %d bytes echoed' %
+          (test.requests, test.failures, test.bytes_echoed))
+    for problem in problems:
+        print('FAIL: %s' % problem)
+    if problems:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
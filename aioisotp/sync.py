@@ -1,4 +1,6 @@
 import asyncio
+import collections
+import concurrent.futures
 import threading
 import queue
 
@@ -17,6 +19,7 @@ class SyncISOTPNetwork(ISOTPNetwork):
     def __init__(self, *args, **kwargs):
         loop = asyncio.new_event_loop()
         self._thread = None
+        self._batcher = _CallBatcher(loop)
         super().__init__(*args, loop=loop, **kwargs)
 
     def open(self):
@@ -29,26 +32,27 @@ class SyncISOTPNetwork(ISOTPNetwork):
         asyncio.set_event_loop(self._loop)
         self._loop.run_forever()
 
-    def create_sync_connection(self, rxid, txid):
+    def create_sync_connection(self, rxid, txid, timeout=None):
         """Create a connection for synchronous operation.
 
         :param int rxid:
             CAN ID to receive messages from.
         :param int txid:
             CAN ID to send messages to.
+        :param float timeout:
+            Max time to wait for the connection to be established.
 
         :returns:
             An object with a :meth:`~aioisotp.sync.SyncConnection.recv` and a
             :meth:`~aioisotp.sync.SyncConnection.send` method.
         :rtype: aioisotp.sync.SyncConnection
         """
-        protocol = SyncConnection(self._loop)
+        protocol = SyncConnection(self._loop, self._batcher)
         coro = self.create_connection(lambda: protocol, rxid, txid)
         if self._loop.is_running():
-            asyncio.run_coroutine_threadsafe(coro, self._loop)
+            asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
         else:
             self._loop.run_until_complete(coro)
-        protocol.wait_connected()
         return protocol
  
     def close(self):
@@ -58,29 +62,111 @@ class SyncISOTPNetwork(ISOTPNetwork):
         super().close()
 
 
+class _CallBatcher:
+    """Runs callbacks submitted from other threads in the event loop.
+
+    Callbacks submitted while the loop has not yet got around to running
+    the previous ones are run together, so the loop is only woken up once
+    for each batch.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._calls = collections.deque()
+
+    def call(self, callback, *args):
+        with self._lock:
+            self._calls.append((callback, args))
+            wakeup = len(self._calls) == 1
+        if wakeup:
+            self._loop.call_soon_threadsafe(self._run)
+
+    def _run(self):
+        with self._lock:
+            calls = self._calls
+            self._calls = collections.deque()
+        for callback, args in calls:
+            try:
+                callback(*args)
+            except Exception as exc:
+                self._loop.call_exception_handler({
+                    'message': 'Exception in submitted callback',
+                    'exception': exc
+                })
+
+
 class SyncConnection(asyncio.Protocol):
     """A class created using
     :meth:`~aioisotp.SyncISOTPNetwork.create_sync_connection`
     """
 
-    def __init__(self, loop=None):
+    def __init__(self, loop=None, batcher=None):
         self.queue = queue.Queue()
         self._connected_event = threading.Event()
         if loop is None:
             loop = asyncio.get_event_loop()
         self._loop = loop
+        if batcher is None:
+            batcher = _CallBatcher(loop)
+        self._batcher = batcher
+        # [future, timeout handle, service ID] for requests waiting for a
+        # response, only accessed from the event loop. The future is None
+        # for requests that timed out but may still get a late response.
+        self._pending = collections.deque()
 
-    def wait_connected(self):
-        self._connected_event.wait(1)
+    def wait_connected(self, timeout=1):
+        self._connected_event.wait(timeout)
 
     def connection_made(self, transport):
         self._transport = transport
         self._connected_event.set()
 
     def data_received(self, payload):
-        self.queue.put_nowait(payload)
+        if not self._pending:
+            self.queue.put_nowait(payload)
+            return
+        if (len(payload) >= 3 and payload[0] == 0x7F and payload[2] == 0x78 and
+                any(entry[2] == payload[1] for entry in self._pending)):
+            # UDS response pending, the real response comes later
+            return
+        index = self._match_request(payload)
+        future, handle, _ = self._pending[index]
+        # Requests which timed out before the one answered now will not
+        # get their responses anymore
+        self._pending = collections.deque(
+            entry for i, entry in enumerate(self._pending)
+            if i > index or (i < index and entry[0] is not None))
+        if future is None:
+            # Late response to a request that timed out
+            return
+        if handle is not None:
+            handle.cancel()
+        future.set_result(payload)
+
+    def _match_request(self, payload):
+        """Find the index of the request a response belongs to.
+
+        UDS responses are matched on service ID, anything else in the
+        order the requests were sent.
+        """
+        for i, (_, _, service) in enumerate(self._pending):
+            if service is None or not payload:
+                continue
+            if (payload[0] == service + 0x40 or
+                    (len(payload) >= 2 and payload[0] == 0x7F and
+                     payload[1] == service)):
+                return i
+        return 0
 
     def connection_lost(self, exc):
+        while self._pending:
+            future, handle, _ = self._pending.popleft()
+            if future is None:
+                continue
+            if handle is not None:
+                handle.cancel()
+            future.set_exception(exc or ConnectionError('Connection closed'))
         if exc is not None:
             self.queue.put_nowait(exc)
 
@@ -108,7 +194,52 @@ class SyncConnection(asyncio.Protocol):
         :param bytes payload:
             Payload to send.
         """
-        self._loop.call_soon_threadsafe(self._transport.write, payload)
+        self._batcher.call(self._transport.write, payload)
+
+    def request(self, payload, timeout=None):
+        """Send a request and get a future for the response.
+
+        UDS responses are matched to requests by service ID and UDS
+        response pending messages are skipped. Other responses are matched
+        to requests in the order they were sent. A late response to a
+        request that timed out is discarded. Payloads received when no
+        request is waiting are available using :meth:`recv`. Any number of
+        requests may be outstanding and this method may be called from any
+        thread.
+
+        :param bytes payload:
+            Request payload to send.
+        :param float timeout:
+            Max time to wait for a response in seconds before the future
+            fails with :exc:`concurrent.futures.TimeoutError`.
+
+        :returns:
+            A future which will get the response payload as result.
+        :rtype: concurrent.futures.Future
+        """
+        future = concurrent.futures.Future()
+        self._batcher.call(self._start_request, payload, future, timeout)
+        return future
+
+    def _start_request(self, payload, future, timeout):
+        if not future.set_running_or_notify_cancel():
+            # Cancelled before it was sent
+            return
+        handle = None
+        if timeout is not None:
+            handle = self._loop.call_later(timeout, self._request_timeout,
+                                           future)
+        service = payload[0] if payload else None
+        self._pending.append([future, handle, service])
+        self._transport.write(payload)
+
+    def _request_timeout(self, future):
+        for entry in self._pending:
+            if entry[0] is future:
+                # Keep the slot to catch a late response
+                entry[0] = entry[1] = None
+                break
+        future.set_exception(concurrent.futures.TimeoutError())
 
     def empty(self):
         while not self.queue.empty():
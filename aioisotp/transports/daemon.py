@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+import logging
+import struct
+
+from ..exceptions import ISOTPError
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Every message starts with payload length, message type and channel number
+HEADER = struct.Struct('>IBH')
+# Payload of an OPEN message
+IDS = struct.Struct('>LL')
+
+# Client to daemon: Open a channel with given receive and transmit IDs
+OPEN = 0
+# Daemon to client: Channel has been opened
+OPENED = 1
+# Both directions: A PDU sent or received on the channel
+DATA = 2
+# Client to daemon: Close the channel
+CLOSE = 3
+# Daemon to client: Channel has been closed, with optional error message
+CLOSED = 4
+
+
+class FramedProtocol(asyncio.Protocol):
+    """Length-prefixed binary messages over a stream.
+
+    The connection is aborted if the peer announces a payload larger
+    than *max_payload* bytes.
+    """
+
+    def __init__(self, max_payload=None):
+        self.max_payload = max_payload
+        self.transport = None
+        self.closed = False
+        self._buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.closed = True
+
+    def data_received(self, data):
+        self._buffer.extend(data)
+        pos = 0
+        while len(self._buffer) - pos >= HEADER.size:
+            size, msg_type, channel = HEADER.unpack_from(self._buffer, pos)
+            if self.max_payload is not None and size > self.max_payload:
+                LOGGER.error('Message of %d bytes is too large, disconnecting',
+                             size)
+                self._buffer.clear()
+                self.transport.abort()
+                return
+            start = pos + HEADER.size
+            end = start + size
+            if len(self._buffer) < end:
+                # Wait for rest of message
+                break
+            self.message_received(msg_type, channel,
+                                  bytes(self._buffer[start:end]))
+            pos = end
+        del self._buffer[:pos]
+
+    def message_received(self, msg_type, channel, payload):
+        raise NotImplementedError()
+
+    def send_message(self, msg_type, channel, payload=b''):
+        self.send_buffers(msg_type, channel, [payload])
+
+    def send_buffers(self, msg_type, channel, buffers):
+        """Send a message with the payload spread over several buffers."""
+        buffers = list(buffers)
+        size = sum(memoryview(buf).nbytes for buf in buffers)
+        self.transport.writelines(
+            [HEADER.pack(size, msg_type, channel)] + buffers)
+
+
+class DaemonTransport(asyncio.Transport):
+    """A transport for one pair of CAN IDs multiplexed over the connection
+    to the daemon.
+    """
+
+    def __init__(self, connection, channel, protocol):
+        super().__init__()
+        self._connection = connection
+        self._channel = channel
+        self._protocol = protocol
+        self._closing = False
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        if not self._connection.closed:
+            self._connection.send_message(CLOSE, self._channel)
+        self._connection.remove_channel(self._channel)
+        self._connection.loop.call_soon(self._protocol.connection_lost, None)
+
+    def can_write_eof(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return self._connection.transport.get_write_buffer_size()
+
+    def write(self, payload):
+        self._connection.send_message(DATA, self._channel, payload)
+
+    def writelines(self, list_of_data):
+        self._connection.send_buffers(DATA, self._channel, list_of_data)
+
+    def _lost(self, exc):
+        self._closing = True
+        self._protocol.connection_lost(exc)
+
+
+class DaemonConnection(FramedProtocol):
+    """Connection to an :class:`aioisotp.daemon.ISOTPDaemon`."""
+
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+        self._channels = {}
+        # Channel number -> (future, protocol factory)
+        self._opening = {}
+        self._channel_numbers = itertools.count()
+
+    def _next_channel(self):
+        while True:
+            channel = next(self._channel_numbers) & 0xFFFF
+            if channel not in self._channels and channel not in self._opening:
+                return channel
+
+    async def open_channel(self, protocol_factory, rxid, txid):
+        channel = self._next_channel()
+        opened = self.loop.create_future()
+        self._opening[channel] = (opened, protocol_factory)
+        self.send_message(OPEN, channel, IDS.pack(rxid, txid))
+        try:
+            return await opened
+        finally:
+            del self._opening[channel]
+
+    def remove_channel(self, channel):
+        self._channels.pop(channel, None)
+
+    def message_received(self, msg_type, channel, payload):
+        if msg_type == DATA:
+            transport = self._channels.get(channel)
+            if transport is not None:
+                transport.get_protocol().data_received(payload)
+        elif msg_type == OPENED:
+            if channel not in self._opening:
+                # Nobody is waiting for it anymore
+                self.send_message(CLOSE, channel)
+                return
+            opened, protocol_factory = self._opening[channel]
+            # Create the protocol right away so that no data is missed
+            protocol = protocol_factory()
+            transport = DaemonTransport(self, channel, protocol)
+            self._channels[channel] = transport
+            protocol.connection_made(transport)
+            opened.set_result((transport, protocol))
+        elif msg_type == CLOSED:
+            exc = ISOTPError(payload.decode()) if payload else None
+            if channel in self._opening:
+                opened, _ = self._opening[channel]
+                opened.set_exception(exc or ISOTPError('Channel closed'))
+            transport = self._channels.pop(channel, None)
+            if transport is not None:
+                transport._lost(exc)
+        else:
+            LOGGER.error('Unknown message type %d from daemon', msg_type)
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        exc = exc or ConnectionError('Connection to daemon closed')
+        for opened, _ in self._opening.values():
+            if not opened.done():
+                opened.set_exception(exc)
+        channels = self._channels
+        self._channels = {}
+        for transport in channels.values():
+            transport._lost(exc)
+
+    def pause_writing(self):
+        for transport in self._channels.values():
+            transport.get_protocol().pause_writing()
+
+    def resume_writing(self):
+        for transport in self._channels.values():
+            transport.get_protocol().resume_writing()
+
+
+class DaemonClient:
+    """Shares one connection to a daemon between all ISO-TP connections
+    of a network.
+
+    :param str path:
+        Path of the daemon's Unix socket.
+    :param asyncio.AbstractEventLoop loop:
+        Event loop to use.
+    """
+
+    def __init__(self, path, loop):
+        self.path = path
+        self._loop = loop
+        self._connection = None
+        self._connecting = None
+
+    async def create_connection(self, protocol_factory, rxid, txid):
+        """Open a new channel to the daemon.
+
+        This method is a *coroutine*.
+        """
+        connection = await self._connect()
+        return await connection.open_channel(protocol_factory, rxid, txid)
+
+    async def _connect(self):
+        if self._connection is not None and not self._connection.closed:
+            return self._connection
+        if self._connecting is None:
+            self._connecting = self._loop.create_task(
+                self._loop.create_unix_connection(
+                    lambda: DaemonConnection(self._loop), self.path))
+        try:
+            _, self._connection = await self._connecting
+        finally:
+            self._connecting = None
+        return self._connection
+
+    def close(self):
+        if self._connection is not None and not self._connection.closed:
+            self._connection.transport.close()
+        self._connection = None
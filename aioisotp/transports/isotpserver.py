@@ -1,20 +1,52 @@
 import asyncio
 import binascii
+import logging
+import socket
 
 
-class WrappedProtocol(asyncio.Protocol):
+LOGGER = logging.getLogger(__name__)
 
-    def __init__(self, protocol, loop):
-        self._protocol = protocol
-        self._loop = loop
+# Number of unanswered keepalive probes before a connection is dead
+KEEPALIVE_PROBES = 3
+
+
+class ServerConnection(asyncio.Protocol):
+    """A TCP connection to an isotpserver.
+
+    Payloads are framed as hex strings between '<' and '>'.
+    """
+
+    def __init__(self, pool, key):
+        self.pool = pool
+        self.key = key
+        self.transport = None
+        #: The :class:`ISOTPServerTransport` currently using the connection
+        self.user = None
+        self.closed = False
+        self.idle_since = None
+        #: A payload has been written but nothing received since
+        self.awaiting_response = False
         self._buffer = bytearray()
 
-    def __getattr__(self, attr):
-        if attr in self.__dict__:
-            return getattr(self, attr)
-        return getattr(self._protocol, attr)
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            # Detect dead peers also when no traffic is sent
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            options = [
+                ('TCP_KEEPIDLE', self.pool.keepalive_idle),
+                ('TCP_KEEPINTVL', self.pool.keepalive_interval),
+                ('TCP_KEEPCNT', KEEPALIVE_PROBES),
+            ]
+            for name, value in options:
+                # Not available on all platforms
+                if hasattr(socket, name):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name),
+                                    max(1, int(value)))
 
     def data_received(self, data):
+        self.awaiting_response = False
         self._buffer.extend(data)
         while True:
             start = self._buffer.find(b'<')
@@ -24,17 +56,300 @@ class WrappedProtocol(asyncio.Protocol):
                 break
             payload = binascii.unhexlify(self._buffer[start+1:end])
             del self._buffer[:end+1]
-            self._protocol.data_received(payload)
+            if self.user is not None:
+                self.user.get_protocol().data_received(payload)
+            # Else it is a late response to a previous user so drop it
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.pool.connection_lost(self, exc)
+
+    def pause_writing(self):
+        if self.user is not None:
+            self.user.get_protocol().pause_writing()
+
+    def resume_writing(self):
+        if self.user is not None:
+            self.user.get_protocol().resume_writing()
+
+    def is_healthy(self):
+        return not self.closed and not self.transport.is_closing()
+
+    def reset(self):
+        """Forget anything received for the previous user."""
+        self.user = None
+        self.awaiting_response = False
+        self._buffer.clear()
+
+    def write(self, payload):
+        self.awaiting_response = True
+        self.transport.write(b'<' + binascii.hexlify(payload) + b'>')
+
+    def writelines(self, list_of_data):
+        self.awaiting_response = True
+        self.transport.write(
+            b'<' + b''.join(binascii.hexlify(data) for data in list_of_data) + b'>')
+
+    def close(self):
+        self.user = None
+        self.transport.close()
+
+
+class ISOTPServerTransport(asyncio.Transport):
+    """Transport given to protocols using an isotpserver.
+
+    The TCP connection is borrowed from a :class:`ISOTPServerPool` and
+    given back when the transport is closed. If the TCP connection is lost
+    it is transparently replaced, queueing any payloads written meanwhile.
+    """
+
+    def __init__(self, pool, key, protocol, connection):
+        super().__init__()
+        self.key = key
+        self._pool = pool
+        self._protocol = protocol
+        self._connection = None
+        self._backlog = []
+        self._closing = False
+        self._attach(connection)
+
+    def _attach(self, connection):
+        self._connection = connection
+        connection.user = self
+        for payload in self._backlog:
+            connection.write(payload)
+        self._backlog = []
+
+    def _detach(self):
+        connection = self._connection
+        self._connection = None
+        if connection is not None:
+            connection.user = None
+        return connection
+
+    def _lost(self, exc):
+        self._closing = True
+        self._protocol.connection_lost(exc)
+
+    def get_extra_info(self, name, default=None):
+        if self._connection is None:
+            return default
+        return self._connection.transport.get_extra_info(name, default)
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def get_protocol(self):
+        return self._protocol
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self._pool.release(self._detach())
+        self._pool.loop.call_soon(self._protocol.connection_lost, None)
+
+    def abort(self):
+        if self._closing:
+            return
+        self._closing = True
+        connection = self._detach()
+        if connection is not None:
+            connection.close()
+        self._pool.loop.call_soon(self._protocol.connection_lost, None)
+
+    def can_write_eof(self):
+        return False
+
+    def get_write_buffer_size(self):
+        if self._connection is None:
+            return sum(len(payload) for payload in self._backlog)
+        return self._connection.transport.get_write_buffer_size()
+
+    def write(self, payload):
+        if self._connection is not None:
+            self._connection.write(payload)
+        else:
+            self._backlog.append(bytes(payload))
+
+    def writelines(self, list_of_data):
+        if self._connection is not None:
+            self._connection.writelines(list_of_data)
+        else:
+            self._backlog.append(b''.join(list_of_data))
+
+
+class ISOTPServerPool:
+    """Keeps TCP connections to isotpservers open for reuse.
+
+    :param asyncio.AbstractEventLoop loop:
+        Event loop to use.
+    :param int max_idle:
+        Max number of idle connections to keep per host and port.
+        Set to 0 to disable pooling.
+    :param float idle_timeout:
+        Close connections that have been idle for this many seconds.
+    :param float health_interval:
+        Seconds between checks of idle connections.
+    :param int max_retries:
+        Number of times to retry a failed connection attempt.
+    :param float backoff:
+        Delay before the first retry, doubled for every following retry.
+    :param float max_backoff:
+        Max delay between retries.
+    :param float quarantine:
+        Seconds to keep a connection out of the pool if it was released
+        while still waiting for a response, so that a late response does
+        not reach the next user.
+    :param float keepalive_idle:
+        Seconds of inactivity before TCP keepalive probes are sent,
+        where supported by the platform.
+    :param float keepalive_interval:
+        Seconds between TCP keepalive probes.
+    """
+
+    def __init__(self, loop, max_idle=4, idle_timeout=60.0,
+                 health_interval=10.0, max_retries=5, backoff=0.1,
+                 max_backoff=5.0, quarantine=1.0, keepalive_idle=10.0,
+                 keepalive_interval=5.0):
+        self.loop = loop
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.quarantine = quarantine
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self._idle = {}
+        self._quarantined = set()
+        self._health_handle = None
+
+    async def create_connection(self, protocol_factory, host, port):
+        """Create a transport using a pooled connection if available.
+
+        This method is a *coroutine*.
+        """
+        key = (host, port)
+        connection = await self._acquire(key)
+        protocol = protocol_factory()
+        transport = ISOTPServerTransport(self, key, protocol, connection)
+        protocol.connection_made(transport)
+        return transport, protocol
+
+    async def _acquire(self, key):
+        idle = self._idle.get(key, [])
+        while idle:
+            connection = idle.pop()
+            if connection.is_healthy():
+                LOGGER.debug('Reusing connection to %s:%d', *key)
+                return connection
+            connection.close()
+        return await self._connect(key)
+
+    async def _connect(self, key):
+        delay = self.backoff
+        attempt = 0
+        while True:
+            try:
+                _, connection = await self.loop.create_connection(
+                    lambda: ServerConnection(self, key), *key)
+            except OSError as exc:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                LOGGER.info('Could not connect to %s:%d (%s), retrying in %g s',
+                            key[0], key[1], exc, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+            else:
+                return connection
+
+    def release(self, connection):
+        """Return a connection to the pool."""
+        if connection is None or not connection.is_healthy():
+            return
+        awaiting_response = connection.awaiting_response
+        connection.reset()
+        if awaiting_response:
+            LOGGER.debug('Quarantining connection to %s:%d', *connection.key)
+            self._quarantined.add(connection)
+            self.loop.call_later(self.quarantine, self._end_quarantine,
+                                 connection)
+            return
+        self._add_idle(connection)
+
+    def _end_quarantine(self, connection):
+        if connection not in self._quarantined:
+            # Lost or pool closed meanwhile
+            return
+        self._quarantined.remove(connection)
+        if connection.is_healthy():
+            # Drop anything that arrived meanwhile
+            connection.reset()
+            self._add_idle(connection)
+
+    def _add_idle(self, connection):
+        idle = self._idle.setdefault(connection.key, [])
+        if len(idle) >= self.max_idle:
+            connection.close()
+            return
+        connection.idle_since = self.loop.time()
+        idle.append(connection)
+        if self._health_handle is None:
+            self._health_handle = self.loop.call_later(
+                self.health_interval, self._check_idle)
 
+    def connection_lost(self, connection, exc):
+        idle = self._idle.get(connection.key, [])
+        if connection in idle:
+            idle.remove(connection)
+        self._quarantined.discard(connection)
+        user = connection.user
+        if user is not None and not user.is_closing():
+            LOGGER.warning('Connection to %s:%d lost, reconnecting',
+                           *connection.key)
+            user._detach()
+            self.loop.create_task(self._reconnect(user))
 
-async def make_isotpserver_transport(protocol_factory, host, port, loop):
-    protocol = protocol_factory()
-    transport, _ = await loop.create_connection(
-        lambda: WrappedProtocol(protocol, loop), host, port)
+    async def _reconnect(self, user):
+        try:
+            connection = await self._connect(user.key)
+        except OSError as exc:
+            user._lost(exc)
+            return
+        if user.is_closing():
+            self.release(connection)
+        else:
+            user._attach(connection)
 
-    # Monkey patch the write method in transport
-    raw_write = transport.write
-    transport.write = lambda payload: raw_write(
-        b'<' + binascii.hexlify(payload) + b'>')
+    def _check_idle(self):
+        """Close idle connections that are broken or have timed out."""
+        self._health_handle = None
+        now = self.loop.time()
+        for idle in self._idle.values():
+            for connection in list(idle):
+                if (not connection.is_healthy() or
+                        now - connection.idle_since > self.idle_timeout):
+                    idle.remove(connection)
+                    connection.close()
+        if any(self._idle.values()):
+            self._health_handle = self.loop.call_later(
+                self.health_interval, self._check_idle)
 
-    return transport, protocol
+    def close(self):
+        """Close all idle connections."""
+        if self._health_handle is not None:
+            self._health_handle.cancel()
+            self._health_handle = None
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle.clear()
+        for connection in self._quarantined:
+            connection.close()
+        self._quarantined.clear()
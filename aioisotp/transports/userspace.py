@@ -1,20 +1,245 @@
 import asyncio
+import collections
+import heapq
+import itertools
 import logging
 import struct
+import time
 
 from ..constants import *
-from ..exceptions import ISOTPError
+from ..exceptions import (ISOTPError, ISOTPTimeoutError, ISOTPOverflowError,
+                          ISOTPWaitOverrunError)
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+class _PDU:
+    """A payload queued for transmission.
+
+    The payload may be spread over several buffers which are kept by
+    reference and sent as if they were one contiguous PDU.
+    """
+
+    #: If it can be sent again from the start after being preempted
+    rewindable = True
+
+    def __init__(self, buffers, priority=0):
+        self.priority = priority
+        #: Optional future for the outcome of the transfer
+        self.future = None
+        #: Number of times the transfer has been preempted
+        self.preemptions = 0
+        self._buffers = []
+        for buf in buffers:
+            view = memoryview(buf)
+            if view.format != 'B' or view.ndim != 1:
+                view = view.cast('B')
+            if view:
+                self._buffers.append(view)
+        self.size = sum(len(view) for view in self._buffers)
+        self.timing = PDUTiming('tx', self.size)
+        self.rewind()
+
+    def rewind(self):
+        """Start over from the beginning of the payload."""
+        self._views = collections.deque(self._buffers)
+        self.remaining = self.size
+        self.timing.first_frame = self.timing.last_frame = None
+        self.timing.fc_turnarounds = []
+
+    def read(self, size):
+        """Consume at most *size* bytes from the start of the payload."""
+        data = bytearray()
+        while size and self._views:
+            view = self._views[0]
+            chunk = view[:size]
+            data.extend(chunk)
+            size -= len(chunk)
+            if len(chunk) == len(view):
+                self._views.popleft()
+            else:
+                self._views[0] = view[len(chunk):]
+        self.remaining -= len(data)
+        return data
+
+    def wait_for(self, size, callback):
+        """Check if *size* bytes, or the rest of the PDU, can be read.
+
+        If not, *callback* will be called when they can.
+        """
+        return True
+
+    def completed(self):
+        """Called by the transport when the last frame has been sent."""
+        if self.future is not None and not self.future.done():
+            self.future.set_result(self.timing)
+
+    def aborted(self, exc):
+        """Called by the transport if the transfer fails."""
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(exc)
+
+
+class StreamingPDU(_PDU):
+    """A PDU of known size whose payload is provided while it is being sent.
+
+    Created using :meth:`ISOTPTransport.write_stream`. Frames are sent as
+    soon as enough payload has been written for them.
+    """
+
+    rewindable = False
+
+    def __init__(self, transport, size, priority=0):
+        super().__init__([], priority)
+        self.size = size
+        self.remaining = size
+        self.timing.size = size
+        #: Number of bytes written but not yet sent
+        self.buffered = 0
+        #: Called without arguments every time payload has been sent
+        self.on_consumed = None
+        #: Called with an exception if the transfer fails
+        self.on_abort = None
+        self.is_aborted = False
+        self._transport = transport
+        self._waiting = None
+
+    def write(self, data):
+        """Add payload to be sent.
+
+        :param data: Any object supporting the buffer protocol.
+        """
+        view = memoryview(data)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        if not view:
+            return
+        self._views.append(view)
+        self.buffered += len(view)
+        if self._waiting is not None and self.buffered >= self._waiting[0]:
+            callback = self._waiting[1]
+            self._waiting = None
+            callback()
+
+    def abort(self):
+        """Stop sending the PDU."""
+        if not self.is_aborted:
+            self._transport._abort_pdu(self, ISOTPError('Aborted by writer'))
+
+    def read(self, size):
+        data = super().read(size)
+        self.buffered -= len(data)
+        if self.on_consumed is not None:
+            self.on_consumed()
+        return data
+
+    def wait_for(self, size, callback):
+        size = min(size, self.remaining)
+        if self.buffered >= size:
+            return True
+        self._waiting = (size, callback)
+        return False
+
+    def aborted(self, exc):
+        super().aborted(exc)
+        self.is_aborted = True
+        self._waiting = None
+        self._views.clear()
+        self.buffered = 0
+        if self.on_abort is not None:
+            self.on_abort(exc)
+
+
+class PDUTiming:
+    """Timestamps for a sent or received PDU, in seconds since the epoch.
+
+    Received frames use the timestamp set by the CAN interface, which is
+    often taken from a hardware clock. Other times are taken from the
+    transport's clock, :func:`time.time` unless a simulated bus is used.
+    """
+
+    __slots__ = ('direction', 'size', 'queued', 'first_frame', 'last_frame',
+                 'delivered', 'fc_turnarounds')
+
+    def __init__(self, direction, size):
+        #: Either ``'rx'`` or ``'tx'``
+        self.direction = direction
+        #: Size of the PDU in bytes
+        self.size = size
+        #: When the PDU was written to the transport (tx only)
+        self.queued = None
+        #: When the single or first frame was received or sent
+        self.first_frame = None
+        #: When the last frame was received or sent
+        self.last_frame = None
+        #: When the PDU was passed to the protocol (rx) or when the transfer
+        #: was complete (tx)
+        self.delivered = None
+        #: Time between the frame preceding each flow control frame and the
+        #: flow control frame itself. For received PDUs this is our own
+        #: response time and for sent PDUs it is the peer's response time.
+        self.fc_turnarounds = []
+
+    @property
+    def duration(self):
+        """Time between first and last frame."""
+        return self.last_frame - self.first_frame
+
+    @property
+    def delivery_delay(self):
+        """Time between the last frame and the PDU being delivered."""
+        return self.delivered - self.last_frame
+
+
 class ISOTPTransport(asyncio.Transport):
+    """ISO-TP transport implemented in user space on top of raw CAN frames.
+
+    Complete PDUs are passed to :meth:`asyncio.Protocol.data_received`.
+    If the protocol is an :class:`asyncio.BufferedProtocol`, the payload is
+    instead written into buffers provided by
+    :meth:`~asyncio.BufferedProtocol.get_buffer` as frames arrive, so the
+    PDU is never held in memory as a whole.
+
+    The protocol may also implement these optional callbacks:
+
+    * ``pdu_started(size)`` when a new PDU of *size* bytes starts arriving.
+    * ``pdu_ended(exc)`` when the PDU is complete (*exc* is ``None``) or
+      has been aborted (*exc* is an :class:`~aioisotp.ISOTPError`).
+
+    Timing of the most recently received and sent PDUs are available as
+    :class:`PDUTiming` instances using ``get_extra_info('rx_timing')`` and
+    ``get_extra_info('tx_timing')``. They are also passed to the optional
+    protocol callback ``pdu_timing(timing)`` when each PDU is complete.
+
+    Use :meth:`send` to get notified when a PDU has been sent or if it
+    failed, either because the receiver reported an overflow, sent too many
+    wait frames or did not respond with a flow control frame within
+    *fc_timeout* seconds.
+
+    Reception of a PDU is aborted if no consecutive frame has been
+    received for *cf_timeout* seconds (N_Cr). An optional *flow_control*
+    object, like :class:`~aioisotp.flowcontrol.AdaptiveFlowControl`,
+    decides the block size and STmin sent in each flow control frame.
+
+    If *throttle* is given, its ``tx_delay`` attribute is added to the
+    separation time between sent frames and before starting the next PDU,
+    for instance from a :class:`~aioisotp.busload.BusLoad`.
+
+    Queued PDUs are sent in order of priority. If *preempt* is true, a
+    transfer in progress is aborted and restarted later when a PDU with
+    higher priority is written. Each PDU is preempted at most
+    *max_preemptions* times, so that long transfers complete even if
+    urgent PDUs are written more often than they take to send.
+    """
 
     logger = LOGGER
 
     def __init__(self, protocol, send_cb, block_size=0, st_min=0,
-                 max_wft=0, loop=None, extra=None):
+                 max_wft=0, loop=None, extra=None, preempt=False,
+                 clock=time.time, close_cb=None, wait_interval=0.5,
+                 fc_timeout=1.0, cf_timeout=1.0, flow_control=None,
+                 throttle=None, max_preemptions=3):
         super().__init__(extra)
         if send_cb is None:
             # Let send_raw be a no-op
@@ -23,19 +248,45 @@ class ISOTPTransport(asyncio.Transport):
         self.block_size = block_size
         self.st_min = st_min
         self.max_wft = max_wft
+        self.preempt = preempt
+        self.max_preemptions = max_preemptions
+        self.wait_interval = wait_interval
+        self.fc_timeout = fc_timeout
+        self.cf_timeout = cf_timeout
+        self.flow_control = flow_control
+        self.throttle = throttle
+        self._clock = clock
+        self._close_cb = close_cb
         self._protocol = protocol
         self._recv_buffer = bytearray()
         self._recv_block_count = 0
         self._recv_seq_no = 0
+        self._recv_count = 0
         self._recv_size = None
+        self._recv_streaming = False
+        self._recv_timing = None
+        self._recv_paused = False
+        self._recv_block_due = False
+        self._recv_wait_handle = None
+        self._recv_timeout_handle = None
+        self._recv_last_time = None
+        self._recv_max_gap = 0.0
+        self._rx_timestamp = None
+        # Heap of (-priority, order, pdu) waiting to be sent
         self._send_queue = []
+        self._send_order = itertools.count()
+        self._send_pdu = None
+        self._send_handle = None
+        self._send_waiting_fc = False
         self._send_seq_no = 0
         self._send_block_count = 0
         self._send_block_size = None
         self._send_st_min = None
         self._send_wf_count = 0
+        self._drain_waiters = []
         self._closing = False
-        if loop is not None:
+        self._closed = False
+        if loop is None:
             loop = asyncio.get_event_loop()
         self._loop = loop
         self._protocol.connection_made(self)
@@ -48,9 +299,20 @@ class ISOTPTransport(asyncio.Transport):
 
     def close(self):
         self._closing = True
-        if not self._send_queue:
+        if self._recv_size is not None:
+            # Nobody will read the rest
+            self._abort_recv(ISOTPError('Transport closed'))
+        if self._send_pdu is None and not self._send_queue:
             # Everything has been sent and we should close down
-            self._protocol.connection_lost(None)
+            self._connection_lost(None)
+
+    def _connection_lost(self, exc):
+        if self._closed:
+            return
+        self._closed = True
+        self._protocol.connection_lost(exc)
+        if self._close_cb is not None:
+            self._close_cb()
 
     def is_closing(self):
         return self._closing
@@ -59,13 +321,27 @@ class ISOTPTransport(asyncio.Transport):
         return False
 
     def get_write_buffer_size(self):
-        return sum(len(buf) for buf in self._send_queue)
+        size = sum(pdu.remaining for _, _, pdu in self._send_queue)
+        if self._send_pdu is not None:
+            size += self._send_pdu.remaining
+        return size
 
-    def feed_data(self, data):
+    def feed_data(self, data, timestamp=None):
         """Feed raw CAN data to transport.
 
+        Malformed frames are logged and ignored.
+
         :param bytearray data: CAN data
+        :param float timestamp:
+            Reception time of the CAN frame.
+            Defaults to the current time.
         """
+        if timestamp is None:
+            timestamp = self._clock()
+        self._rx_timestamp = timestamp
+        if not data:
+            self.logger.warning('Empty frame ignored')
+            return
         pci_type = data[0] >> 4
         if pci_type == FLOW_CONTROL_FRAME:
             self._handle_fc(data)
@@ -77,171 +353,495 @@ class ISOTPTransport(asyncio.Transport):
             self._handle_ff(data)
         elif pci_type == CONSECUTIVE_FRAME:
             self._handle_cf(data)
-
-    def _reset_recv(self):
-        self._recv_buffer.clear()
+        else:
+            self.logger.warning('Unknown frame type %d ignored', pci_type)
+
+    def _start_recv(self, size):
+        """Prepare for reception of a new PDU."""
+        if self._recv_size is not None:
+            if self.flow_control is not None:
+                # The sender gave up on the previous PDU, frames were lost
+                self.flow_control.frame_lost()
+            self._abort_recv(ISOTPError('Reception interrupted by new PDU'))
         self._recv_seq_no = 1
         self._recv_block_count = 0
+        self._recv_block_due = False
+        self._recv_count = 0
+        self._recv_size = size
+        self._recv_timing = PDUTiming('rx', size)
+        self._recv_timing.first_frame = self._rx_timestamp
+        self._recv_timing.last_frame = self._rx_timestamp
+        # Buffered protocols get the data written directly into their buffers
+        self._recv_streaming = hasattr(self._protocol, 'get_buffer')
+        pdu_started = getattr(self._protocol, 'pdu_started', None)
+        if pdu_started is not None:
+            pdu_started(size)
+
+    def _recv_data(self, data):
+        """Store or stream payload of a received frame."""
+        if self._recv_size is None:
+            # Rejected by protocol in pdu_started()
+            return
+        # Discard any padding after the end of the PDU
+        data = data[:self._recv_size - self._recv_count]
+        self._recv_count += len(data)
+        if not self._recv_streaming:
+            self._recv_buffer.extend(data)
+            return
+
+        view = memoryview(data)
+        while view:
+            buf = memoryview(self._protocol.get_buffer(len(view)))
+            if buf.format != 'B' or buf.ndim != 1:
+                buf = buf.cast('B')
+            size = min(len(buf), len(view))
+            if not size:
+                raise RuntimeError('get_buffer() returned an empty buffer')
+            buf[:size] = view[:size]
+            self._protocol.buffer_updated(size)
+            view = view[size:]
 
     def _handle_sf(self, data):
         """Handle single frame."""
-        self._reset_recv()
-        self._recv_size = data[0] & 0xF
-        self._recv_buffer.extend(data[1:])
-        self._end_recv()
+        size = data[0] & 0xF
+        if not 0 < size < len(data):
+            self.logger.warning('Invalid single frame ignored')
+            return
+        self._start_recv(size)
+        self._recv_data(data[1:])
+        if self._recv_size is not None:
+            self._end_recv()
 
     def _handle_ff(self, data):
         """Handle first frame."""
-        self._reset_recv()
-
+        if len(data) < 8:
+            self.logger.warning('Too short first frame ignored')
+            return
         size = ((data[0] & 0xF) << 8) + data[1]
         if not size:
             # Size is > 4095
-            size = struct.unpack_from('>L', data, 2)
+            size, = struct.unpack_from('>L', data, 2)
             frame_payload = data[6:]
         else:
             frame_payload = data[2:]
+        if size < 8:
+            self.logger.warning('First frame for only %d bytes ignored', size)
+            return
 
-        self._recv_size = size
-        self._recv_buffer.extend(frame_payload)
+        self._start_recv(size)
+        self._recv_data(frame_payload)
+        if self._recv_size is None:
+            # Rejected by protocol
+            return
 
-        self._send_fc()
+        self._request_block()
 
     def _handle_cf(self, data):
         """Handle consecutive frame."""
+        if self._recv_size is None:
+            # No reception in progress
+            return
+
         seq_no = data[0] & 0xF
         if seq_no != self._recv_seq_no & 0xF:
-            raise ISOTPError('Wrong sequence number')
-
-        self._recv_buffer.extend(data[1:])
+            if self.flow_control is not None:
+                self.flow_control.frame_lost()
+            self._abort_recv(ISOTPError('Wrong sequence number'))
+            return
+
+        self._recv_data(data[1:])
+        if self._recv_size is None:
+            # Rejected by protocol
+            return
+        if self.flow_control is not None and self._recv_block_count:
+            gap = self._rx_timestamp - self._recv_timing.last_frame
+            if gap > self._recv_max_gap:
+                self._recv_max_gap = gap
+        self._recv_timing.last_frame = self._rx_timestamp
+        self._recv_last_time = self._loop.time()
 
         self._recv_seq_no += 1
         self._recv_block_count += 1
 
-        if len(self._recv_buffer) >= self._recv_size:
+        if self._recv_count >= self._recv_size:
             # Last message received!
             self._end_recv()
 
         elif self._recv_block_count == self.block_size:
-            self._send_fc()
             self._recv_block_count = 0
+            if self.flow_control is not None:
+                self.flow_control.block_received(self._recv_max_gap)
+            self._request_block()
+
+    def _request_block(self):
+        """Ask sender for the next block, or to wait if reading is paused."""
+        if self._recv_paused:
+            self._recv_block_due = True
+            self._send_wait()
+        else:
+            self._send_fc()
+
+    def _send_wait(self):
+        """Keep sending wait frames until reading is resumed."""
+        self._recv_wait_handle = None
+        if self._recv_size is None or not self._recv_block_due:
+            return
+        self._send_fc(WAIT)
+        self._recv_wait_handle = self._loop.call_later(
+            self.wait_interval, self._send_wait)
+
+    def pause_reading(self):
+        """Stop the sender at the next block boundary.
+
+        Wait frames will be sent until :meth:`resume_reading` is called.
+        Has no effect on the current PDU if the block size is unlimited.
+        """
+        self._recv_paused = True
+
+    def resume_reading(self):
+        self._recv_paused = False
+        if self._recv_wait_handle is not None:
+            self._recv_wait_handle.cancel()
+            self._recv_wait_handle = None
+        if self._recv_block_due:
+            self._recv_block_due = False
+            if self._recv_size is not None:
+                self._send_fc()
+
+    def is_reading(self):
+        return not self._recv_paused
+
+    def reject(self):
+        """Abort reception of the current PDU and send an overflow flow
+        control frame to the sender.
+        """
+        if self._recv_size is not None:
+            self._send_fc(OVERFLOW)
+            self._abort_recv(ISOTPError('Reception rejected'))
 
     def _send_fc(self, fs=CONTINUE_TO_SEND):
         """Send flow control frame."""
         self.logger.debug('Sending flow control frame')
+        if fs == CONTINUE_TO_SEND and self.flow_control is not None:
+            # Applies to the coming block
+            self.block_size = self.flow_control.block_size
+            self.st_min = self.flow_control.st_min
+            self._recv_max_gap = 0.0
 
         data = bytearray(3)
         data[0] = (FLOW_CONTROL_FRAME << 4) + fs
         data[1] = self.block_size
         data[2] = self.st_min
         self.send_raw(data)
+        if fs == CONTINUE_TO_SEND:
+            self._recv_timing.fc_turnarounds.append(
+                self._clock() - self._rx_timestamp)
+            self._recv_last_time = self._loop.time()
+            if self._recv_timeout_handle is None and self.cf_timeout:
+                self._recv_timeout_handle = self._loop.call_later(
+                    self.cf_timeout, self._check_recv_timeout)
+
+    def _check_recv_timeout(self):
+        self._recv_timeout_handle = None
+        if self._recv_size is None or self._recv_block_due:
+            # Timer is restarted when the next block is requested
+            return
+        remaining = self._recv_last_time + self.cf_timeout - self._loop.time()
+        if remaining > 0:
+            # Frames have been received since the timer was started
+            self._recv_timeout_handle = self._loop.call_later(
+                remaining, self._check_recv_timeout)
+            return
+        if self.flow_control is not None:
+            self.flow_control.timed_out()
+        self._abort_recv(
+            ISOTPTimeoutError('Timeout waiting for consecutive frame'))
+
+    def _stop_recv_timer(self):
+        if self._recv_timeout_handle is not None:
+            self._recv_timeout_handle.cancel()
+            self._recv_timeout_handle = None
 
     def _end_recv(self):
-        data = bytes(self._recv_buffer[:self._recv_size])
-        self._protocol.data_received(data)
+        self._recv_size = None
+        self._stop_recv_timer()
+        if self.flow_control is not None and self._recv_block_count:
+            self.flow_control.block_received(self._recv_max_gap)
+        timing = self._recv_timing
+        timing.delivered = self._clock()
+        self._extra['rx_timing'] = timing
+        if not self._recv_streaming:
+            data = bytes(self._recv_buffer)
+            self._recv_buffer.clear()
+            self._protocol.data_received(data)
+        pdu_ended = getattr(self._protocol, 'pdu_ended', None)
+        if pdu_ended is not None:
+            pdu_ended(None)
+        self._report_timing(timing)
+
+    def _report_timing(self, timing):
+        pdu_timing = getattr(self._protocol, 'pdu_timing', None)
+        if pdu_timing is not None:
+            pdu_timing(timing)
+
+    def _abort_recv(self, exc):
+        """Discard a partially received PDU."""
+        self.logger.warning('Reception aborted: %s', exc)
+        self._recv_size = None
+        self._recv_block_due = False
+        self._stop_recv_timer()
+        if self._recv_wait_handle is not None:
+            self._recv_wait_handle.cancel()
+            self._recv_wait_handle = None
+        self._recv_buffer.clear()
+        pdu_ended = getattr(self._protocol, 'pdu_ended', None)
+        if pdu_ended is not None:
+            pdu_ended(exc)
+
+    def write(self, payload, priority=0):
+        """Queue a payload for transmission.
+
+        Any object supporting the buffer protocol may be given. It is kept
+        by reference, so it must not be modified until it has been sent.
+
+        :param int priority:
+            PDUs with higher priority are sent before those with lower
+            priority. PDUs with equal priority are sent in order.
+        """
+        self._queue_pdu(_PDU([payload], priority))
+
+    def writelines(self, list_of_data, priority=0):
+        """Queue several buffers to be sent as one PDU.
+
+        The buffers are segmented as if they were concatenated, without
+        copying them first.
+        """
+        self._queue_pdu(_PDU(list_of_data, priority))
+
+    def send(self, *buffers, priority=0):
+        """Queue a PDU and get a future for when it has been sent.
+
+        Several buffers may be given which are sent as one PDU, like
+        :meth:`writelines`. Cancelling the future aborts the transfer.
+
+        :param int priority:
+            Same as for :meth:`write`.
+
+        :returns:
+            A future which gets the :class:`PDUTiming` of the PDU as result
+            when the last frame has been handed to the CAN bus, or an
+            :class:`~aioisotp.ISOTPError` if the transfer failed.
+        :rtype: asyncio.Future
+        """
+        pdu = _PDU(buffers, priority)
+        pdu.future = self._loop.create_future()
+        pdu.future.add_done_callback(
+            lambda future: future.cancelled() and self._abort_pdu(
+                pdu, ISOTPError('Cancelled')))
+        self._queue_pdu(pdu)
+        return pdu.future
+
+    async def drain(self):
+        """Wait until all queued PDUs have been sent or have failed.
+
+        This method is a *coroutine*.
+        """
+        if self._send_pdu is None and not self._send_queue:
+            return
+        waiter = self._loop.create_future()
+        self._drain_waiters.append(waiter)
+        await waiter
+
+    def write_stream(self, size, priority=0):
+        """Queue a PDU before its payload is available.
+
+        Useful to start forwarding a PDU before all of it has been received.
 
-    def write(self, payload):
-        self._send_queue.append(bytearray(payload))
-        if len(self._send_queue) == 1:
+        :param int size:
+            Total size of the PDU in bytes.
+        :param int priority:
+            Same as for :meth:`write`.
+
+        :returns:
+            An object to write the payload to.
+        :rtype: aioisotp.transports.userspace.StreamingPDU
+        """
+        pdu = StreamingPDU(self, size, priority)
+        self._queue_pdu(pdu)
+        return pdu
+
+    def _queue_pdu(self, pdu):
+        pdu.timing.queued = self._clock()
+        pdu.order = next(self._send_order)
+        heapq.heappush(self._send_queue, (-pdu.priority, pdu.order, pdu))
+        if self._send_pdu is None and len(self._send_queue) == 1:
             # Nothing else is sending
             # Ask protocol to wait with next payload if possible
             self._protocol.pause_writing()
             self._start_send()
+        elif (self.preempt and self._send_pdu is not None and
+                self._send_pdu.rewindable and
+                self._send_pdu.preemptions < self.max_preemptions and
+                pdu.priority > self._send_pdu.priority):
+            self._preempt_send()
+
+    def _preempt_send(self):
+        """Abort current transfer and put it back in the queue."""
+        pdu = self._send_pdu
+        self.logger.debug('Transfer of %d bytes preempted', pdu.size)
+        if self._send_handle is not None:
+            self._send_handle.cancel()
+            self._send_handle = None
+        self._send_waiting_fc = False
+        self._send_pdu = None
+        pdu.preemptions += 1
+        pdu.rewind()
+        heapq.heappush(self._send_queue, (-pdu.priority, pdu.order, pdu))
+        self._start_send()
 
     def _start_send(self):
         """Start sending frames."""
-        buffer = self._send_queue[0]
-        self.logger.debug('Starting transfer of %d bytes', len(buffer))
-        if len(buffer) < 8:
+        if self._send_pdu is not None or not self._send_queue:
+            # Already sending or preempted by something else
+            return
+        _, _, pdu = heapq.heappop(self._send_queue)
+        self._send_pdu = pdu
+        self.logger.debug('Starting transfer of %d bytes', pdu.size)
+        if pdu.size < 8:
             self._send_sf()
         else:
             self._send_ff()
 
     def _send_sf(self):
         """Send single frame."""
-        buffer = self._send_queue[0]
-        size = len(buffer)
+        pdu = self._send_pdu
+        if not pdu.wait_for(pdu.size, self._send_sf):
+            return
+        size = pdu.size
 
         data = bytearray()
         data.append((SINGLE_FRAME << 4) + size)
-        data.extend(buffer)
+        data.extend(pdu.read(size))
         self.send_raw(data)
+        pdu.timing.first_frame = pdu.timing.last_frame = self._clock()
 
         self._end_send()
 
     def _send_ff(self):
         """Send first frame."""
-        buffer = self._send_queue[0]
-        size = len(buffer)
+        pdu = self._send_pdu
+        size = pdu.size
+        if not pdu.wait_for(6 if size < 4096 else 2, self._send_ff):
+            return
 
         data = bytearray(8)
         if size < 4096:
             data[0] = (FIRST_FRAME << 4) + (size >> 8)
             data[1] = size & 0xFF
-            data[2:8] = buffer[0:6]
-            del buffer[0:6]
+            data[2:8] = pdu.read(6)
         else:
             data[0] = FIRST_FRAME << 4
             data[1] = 0
             struct.pack_into('>L', data, 2, size)
-            data[6:8] = buffer[0:2]
-            del buffer[0:2]
+            data[6:8] = pdu.read(2)
 
         self.logger.debug('Sending first frame')
         self.send_raw(data)
+        pdu.timing.first_frame = pdu.timing.last_frame = self._clock()
 
-        self.logger.debug('Waiting for flow control frame...')
         self._send_seq_no = 1
         self._send_block_count = 0
+        self._send_wf_count = 0
+        self._wait_for_fc()
+
+    def _wait_for_fc(self):
+        self.logger.debug('Waiting for flow control frame...')
+        self._send_waiting_fc = True
+        self._send_handle = self._loop.call_later(
+            self.fc_timeout, self._fc_timed_out)
+
+    def _fc_timed_out(self):
+        self._send_handle = None
+        self.logger.error('Timeout waiting for flow control frame')
+        self._abort_send(
+            ISOTPTimeoutError('Timeout waiting for flow control frame'))
 
     def _handle_fc(self, data):
         """Handle flow control frame."""
+        if len(data) < 3:
+            self.logger.warning('Too short flow control frame ignored')
+            return
         byte1, block_size, st_min = struct.unpack_from('BBB', data)
         fs = byte1 & 0xF
+        if not self._send_waiting_fc:
+            if (fs == OVERFLOW and self._send_pdu is not None and
+                    self._send_pdu.timing.first_frame is not None):
+                # Receiver gave up in the middle of a block
+                self.logger.error('Transfer aborted by receiver')
+                self._abort_send(
+                    ISOTPOverflowError('Receiver reported overflow'))
+                return
+            self.logger.debug('Unexpected flow control frame ignored')
+            return
+        self._send_handle.cancel()
+        self._send_handle = None
         if fs == CONTINUE_TO_SEND:
             self.logger.debug('block_size = %d, st_min = %d', block_size, st_min)
+            self._send_waiting_fc = False
+            timing = self._send_pdu.timing
+            timing.fc_turnarounds.append(self._rx_timestamp - timing.last_frame)
             self._send_block_size = block_size
             self._send_st_min = st_min
             # Ready to send next message
             self._send_cfs()
         elif fs == WAIT:
-            # Do nothing
-            self._send_wf_count += 1        
+            self._send_wf_count += 1
             if self._send_wf_count > self.max_wft:
                 self.logger.error('Wait frame overrun')
+                self._abort_send(ISOTPWaitOverrunError(
+                    'Receiver sent more than %d wait frames' % self.max_wft))
+            else:
+                # Restart N_Bs timer
+                self._wait_for_fc()
         elif fs == OVERFLOW:
             self.logger.error('Buffer overflow/abort')
+            self._abort_send(ISOTPOverflowError('Receiver reported overflow'))
         else:
             self.logger.error('Invalid flow status')
+            self._wait_for_fc()
 
     def _send_cfs(self):
+        self._send_handle = None
+        if not self._send_pdu.wait_for(7, self._send_cfs):
+            # Not enough payload yet
+            return
         send_more = self._send_cf()
         if send_more:
             wait = self._get_wait_time()
             # Call ourselves after the wait
-            self._loop.call_later(wait, self._send_cfs)
+            self._send_handle = self._loop.call_later(wait, self._send_cfs)
 
     def _send_cf(self):
         """Send consecutive frame."""
-        buffer = self._send_queue[0]
+        pdu = self._send_pdu
         data = bytearray()
         data.append((CONSECUTIVE_FRAME << 4) + (self._send_seq_no & 0xF))
-        data.extend(buffer[0:7])
+        data.extend(pdu.read(7))
 
         self.send_raw(data)
+        pdu.timing.last_frame = self._clock()
 
-        del buffer[0:7]
         self._send_seq_no += 1
         self._send_block_count += 1
 
-        if not buffer:
+        if not pdu.remaining:
             # Last message sent, clean up
             self._end_send()
             return False
         elif self._send_block_count == self._send_block_size:
             self._send_block_count = 0
             self._send_wf_count = 0
-            self.logger.debug('Waiting for flow control frame...')
+            self._wait_for_fc()
             return False
         else:
             # Send another message
@@ -258,6 +858,10 @@ class ISOTPTransport(asyncio.Transport):
         else:
             wait = 0.127
 
+        if self.throttle is not None:
+            # Back off while the bus is busy
+            wait += self.throttle.tx_delay
+
         # Normally the event loop does not bother waiting for tasks
         # scheduled closer in time than the internal clock resolution.
         # In order to honor the requested minimum separation time, we make
@@ -271,16 +875,61 @@ class ISOTPTransport(asyncio.Transport):
     def _end_send(self):
         """Clean up current transmission and possibly start next."""
         self.logger.debug('Transfer complete!')
-        # Remove the transmission from the queue
-        if self._send_queue:
-            del self._send_queue[0]
+        timing = self._send_pdu.timing
+        timing.delivered = self._clock()
+        self._extra['tx_timing'] = timing
+        pdu = self._send_pdu
+        self._send_pdu = None
+        pdu.completed()
+        self._next_send()
+        self._report_timing(timing)
+        self._check_closed()
+
+    def _abort_pdu(self, pdu, exc):
+        """Abort a PDU being sent or remove it from the queue."""
+        if pdu is self._send_pdu:
+            self._abort_send(exc)
+            return
+        for i, entry in enumerate(self._send_queue):
+            if entry[2] is pdu:
+                del self._send_queue[i]
+                heapq.heapify(self._send_queue)
+                pdu.aborted(exc)
+                break
+
+    def _abort_send(self, exc):
+        """Give up current transmission and possibly start next."""
+        pdu = self._send_pdu
+        if pdu is None:
+            return
+        self.logger.debug('Transfer aborted: %s', exc)
+        if self._send_handle is not None:
+            self._send_handle.cancel()
+            self._send_handle = None
+        self._send_waiting_fc = False
+        self._send_pdu = None
+        pdu.aborted(exc)
+        self._next_send()
+        self._check_closed()
+
+    def _next_send(self):
         # Check if there are more transmissions queued up
         if self._send_queue:
             # Yes, start another send
-            self._loop.call_soon(self._start_send)
+            if self.throttle is not None and self.throttle.tx_delay:
+                self._loop.call_later(self.throttle.tx_delay, self._start_send)
+            else:
+                self._loop.call_soon(self._start_send)
         else:
             # Tell protocol that it can send more payloads
             self._protocol.resume_writing()
-            if self._closing:
-                # Everything has been sent and we should close down
-                self._protocol.connection_lost(None)
+            waiters = self._drain_waiters
+            self._drain_waiters = []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def _check_closed(self):
+        if self._closing and self._send_pdu is None and not self._send_queue:
+            # Everything has been sent and we should close down
+            self._connection_lost(None)
@@ -0,0 +1,80 @@
+"""
+Download an image to several simulated ECUs on one bus at the same time
+and report the achieved speed for each of them.
+
+The ECUs answer some TransferData requests with "response pending" first,
+like a real ECU busy writing to flash. The bus runs on virtual time, so
+the reported speeds are those of a real 500 kbit/s bus.
+"""
+
+import asyncio
+import logging
+import os
+
+import aioisotp
+from aioisotp.flash import Flasher, flash_all
+from aioisotp.simulation import VirtualClockLoop, SimulatedBus
+
+
+ECUS = 4
+IMAGE_SIZE = 64 * 1024
+
+
+class SimulatedECU(asyncio.Protocol):
+    """Accepts downloads and stores them."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.image = bytearray()
+        self.counter = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        service = data[0]
+        if service == 0x34:
+            # Up to 1026 bytes per TransferData
+            self.transport.write(b'\x74\x20\x04\x02')
+            self.counter = 1
+        elif service == 0x36:
+            if data[1] != self.counter:
+                self.transport.write(b'\x7f\x36\x73')
+                return
+            self.image.extend(data[2:])
+            self.counter = (self.counter + 1) & 0xFF
+            response = b'\x76' + data[1:2]
+            if data[1] % 8 == 0:
+                # Pretend that writing to flash takes a while
+                self.transport.write(b'\x7f\x36\x78')
+                self.loop.call_later(0.05, self.transport.write, response)
+            else:
+                self.transport.write(response)
+        elif service == 0x37:
+            self.transport.write(b'\x77')
+
+
+async def main(loop):
+    bus = SimulatedBus(loop=loop)
+    tester = aioisotp.ISOTPNetwork(bus=bus.create_interface(), loop=loop)
+    ecu_network = aioisotp.ISOTPNetwork(bus=bus.create_interface(), loop=loop,
+                                        block_size=8, st_min=1)
+    image = os.urandom(IMAGE_SIZE)
+    with tester.open(), ecu_network.open():
+        ecus = []
+        flashers = []
+        for i in range(ECUS):
+            _, ecu = await ecu_network.create_connection(
+                lambda: SimulatedECU(loop), 0x7E0 + i, 0x7E8 + i)
+            ecus.append(ecu)
+            flashers.append(
+                Flasher(tester, 0x7E8 + i, 0x7E0 + i, image, 0x8000))
+        await flash_all(flashers)
+        for flasher, ecu in zip(flashers, ecus):
+            assert ecu.image == image
+            print('ECU 0x%X: %.0f bytes/s' % (flasher.txid, flasher.rate))
+
+
+logging.basicConfig(level=logging.WARNING)
+loop = VirtualClockLoop()
+loop.run_until_complete(main(loop))
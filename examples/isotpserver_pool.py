@@ -0,0 +1,63 @@
+"""
+Measure connection setup latency against a local stub isotpserver,
+with and without pooling of TCP connections.
+
+Each session connects, sends one request, waits for the response and
+closes the connection again.
+"""
+
+import asyncio
+import time
+
+from aioisotp.transports.isotpserver import ISOTPServerPool
+
+
+SESSIONS = 500
+
+
+class StubServer(asyncio.Protocol):
+    """Echoes every framed payload back."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+
+class Client(asyncio.Protocol):
+
+    def __init__(self):
+        self.response = asyncio.Future()
+
+    def data_received(self, data):
+        self.response.set_result(data)
+
+
+async def run(name, pool, port):
+    start = time.perf_counter()
+    for _ in range(SESSIONS):
+        transport, protocol = await pool.create_connection(
+            Client, '127.0.0.1', port)
+        transport.write(b'\x3e\x00')
+        await protocol.response
+        transport.close()
+    elapsed = time.perf_counter() - start
+    print('%s: %.0f us per session' % (name, elapsed / SESSIONS * 1e6))
+    pool.close()
+
+
+async def main():
+    loop = asyncio.get_event_loop()
+    server = await loop.create_server(StubServer, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    await run('Without pooling', ISOTPServerPool(loop, max_idle=0), port)
+    await run('With pooling', ISOTPServerPool(loop), port)
+
+    server.close()
+    await server.wait_closed()
+
+
+loop = asyncio.get_event_loop()
+loop.run_until_complete(main())
@@ -0,0 +1,67 @@
+"""
+Measure request/response round-trips per second from synchronous code.
+
+Every client thread has its own connection to an echo server running in
+the network's event loop.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import aioisotp
+
+
+THREADS = 4
+REQUESTS = 2000
+WINDOW = 16
+
+
+class EchoServer(asyncio.Protocol):
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+
+def sequential(connection):
+    for i in range(REQUESTS):
+        connection.request(b'\x3e\x00', timeout=1).result()
+
+
+def pipelined(connection):
+    futures = []
+    for i in range(REQUESTS):
+        futures.append(connection.request(b'\x3e\x00', timeout=5))
+        if len(futures) == WINDOW:
+            concurrent.futures.wait(futures)
+            futures = []
+    concurrent.futures.wait(futures)
+
+
+def run(name, clients, worker):
+    threads = [threading.Thread(target=worker, args=(client, ))
+               for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print('%s: %.0f round-trips/s' % (name, THREADS * REQUESTS / elapsed))
+
+
+network = aioisotp.SyncISOTPNetwork(channel='vcan0', interface='virtual',
+                                    receive_own_messages=True)
+with network.open():
+    clients = []
+    for i in range(THREADS):
+        coro = network.create_connection(EchoServer, 0x700 + i, 0x780 + i)
+        asyncio.run_coroutine_threadsafe(coro, network._loop).result()
+        clients.append(network.create_sync_connection(0x780 + i, 0x700 + i))
+
+    run('Sequential', clients, sequential)
+    run('Pipelined', clients, pipelined)